@@ -0,0 +1,228 @@
+import os
+import time
+import hashlib
+import numpy as np
+from embedding_store import STORE_DIR, open_store
+
+INDEX_FILE = 'ivf_index.npz'
+INDEX_VERSION = 1
+
+
+def gallery_fingerprint(ids, matrix):
+    """Hash of the ids and encodings an index was built from, to detect a stale index"""
+    digest = hashlib.sha1()
+    digest.update('\n'.join(map(str, ids)).encode('utf-8'))
+    digest.update(np.ascontiguousarray(matrix, dtype=np.float32).tobytes())
+    return digest.hexdigest()
+
+
+def _nearest_centroid(vectors, centroids, chunk_size=8192):
+    # argmin |x - c|^2 = argmin |c|^2 - 2xc, chunked so 50k x nlist never sits in memory at once
+    centroid_sq = np.einsum('ij,ij->i', centroids, centroids)
+    assignment = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), chunk_size):
+        chunk = vectors[start:start + chunk_size]
+        assignment[start:start + chunk_size] = (centroid_sq - 2.0 * (chunk @ centroids.T)).argmin(axis=1)
+    return assignment
+
+
+def kmeans(vectors, k, iterations=15, seed=0):
+    """Plain Lloyd k-means in NumPy; empty clusters are reseeded from random points"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = _nearest_centroid(vectors, centroids)
+        counts = np.bincount(assignment, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, np.newaxis]
+        if empty.any():
+            centroids[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+    return centroids
+
+
+class IVFIndex:
+    """Inverted-file approximate nearest-neighbour index over face encodings
+
+    k-means splits the gallery into nlist cells and the encodings are
+    stored grouped by cell. A search ranks the cells by centroid distance
+    and scans only the nprobe nearest ones exactly, so it touches about
+    nprobe / nlist of the gallery. Raising nprobe trades latency for
+    recall; nprobe == nlist is an exact scan. Uses the same euclidean
+    distance and best_matches() interface as FaceGallery.
+    """
+
+    metric = 'euclidean'
+
+    def __init__(self, nlist=None, nprobe=8):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.ids = []
+        self.centroids = None
+        self.vectors = None         # Encodings grouped by cell
+        self.sq_norms = None
+        self.rows = None            # Position in self.ids of each row of self.vectors
+        self.offsets = None         # Cell c holds rows offsets[c]:offsets[c + 1]
+        self.fingerprint = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def build(self, ids, matrix, iterations=15, seed=0, train_size=None):
+        """Cluster the gallery and lay out the inverted lists"""
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        self.ids = list(ids)
+        self.fingerprint = gallery_fingerprint(self.ids, matrix)
+        if not self.ids:
+            self.centroids = None
+            return self
+
+        # About sqrt(N) cells keeps both the coarse and the fine scan small
+        nlist = self.nlist or max(1, int(round(np.sqrt(len(matrix)))))
+        nlist = min(nlist, len(matrix))
+        # k-means on a sample is enough to place the cells
+        train_size = train_size or min(len(matrix), nlist * 64)
+        rng = np.random.default_rng(seed)
+        sample = matrix[rng.choice(len(matrix), train_size, replace=False)] if train_size < len(matrix) else matrix
+        self.centroids = kmeans(sample, nlist, iterations, seed)
+        self.nlist = nlist
+
+        assignment = _nearest_centroid(matrix, self.centroids)
+        order = np.argsort(assignment, kind='stable')
+        self.rows = order.astype(np.int32)
+        self.vectors = matrix[order]
+        self.sq_norms = np.einsum('ij,ij->i', self.vectors, self.vectors)
+        self.offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=nlist), out=self.offsets[1:])
+        return self
+
+    def search(self, probes, k=1, nprobe=None):
+        """Return (row indices, distances), each M x k, best first; -1 / inf where fewer than k were scanned"""
+        probes = np.atleast_2d(np.asarray(probes, dtype=np.float32))
+        rows = np.full((len(probes), k), -1, dtype=np.int64)
+        distances = np.full((len(probes), k), np.inf, dtype=np.float32)
+        if self.centroids is None:
+            return rows, distances
+
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        centroid_sq = np.einsum('ij,ij->i', self.centroids, self.centroids)
+        coarse = centroid_sq[np.newaxis, :] - 2.0 * (probes @ self.centroids.T)
+        if nprobe < self.nlist:
+            cells = np.argpartition(coarse, nprobe - 1, axis=1)[:, :nprobe]
+        else:
+            cells = np.tile(np.arange(self.nlist), (len(probes), 1))
+
+        for i, probe in enumerate(probes):
+            candidates = np.concatenate([np.arange(self.offsets[c], self.offsets[c + 1]) for c in cells[i]])
+            if len(candidates) == 0:
+                continue
+            sq_dist = (self.sq_norms[candidates] - 2.0 * (self.vectors[candidates] @ probe)) + probe @ probe
+            found = min(k, len(candidates))
+            top = np.argpartition(sq_dist, found - 1)[:found] if found < len(candidates) else np.arange(found)
+            top = top[np.argsort(sq_dist[top])]
+            rows[i, :found] = self.rows[candidates[top]]
+            distances[i, :found] = np.sqrt(np.maximum(sq_dist[top], 0.0))
+        return rows, distances
+
+    def best_matches(self, probes, threshold=None, nprobe=None):
+        """Same contract as FaceGallery.best_matches: (ids with None past threshold, best distances)"""
+        rows, distances = self.search(probes, 1, nprobe)
+        rows, distances = rows[:, 0], distances[:, 0]
+        accepted = rows >= 0
+        if threshold is not None:
+            accepted &= distances <= threshold
+        ids = [self.ids[row] if ok else None for row, ok in zip(rows.tolist(), accepted.tolist())]
+        return ids, distances
+
+    def save(self, path):
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, version=INDEX_VERSION, fingerprint=self.fingerprint, nprobe=self.nprobe,
+                 ids=np.array(self.ids, dtype=str),
+                 centroids=self.centroids if self.centroids is not None else np.empty((0, 0), np.float32),
+                 vectors=self.vectors if self.vectors is not None else np.empty((0, 0), np.float32),
+                 rows=self.rows if self.rows is not None else np.empty(0, np.int32),
+                 offsets=self.offsets if self.offsets is not None else np.zeros(1, np.int64))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            if int(data['version']) != INDEX_VERSION:
+                raise ValueError(f"Unsupported index version: {int(data['version'])}")
+            index = cls(nprobe=int(data['nprobe']))
+            index.fingerprint = str(data['fingerprint'])
+            index.ids = data['ids'].tolist()
+            if len(data['centroids']):
+                index.centroids = data['centroids']
+                index.nlist = len(index.centroids)
+                index.vectors = data['vectors']
+                index.sq_norms = np.einsum('ij,ij->i', index.vectors, index.vectors)
+                index.rows = data['rows']
+                index.offsets = data['offsets']
+        return index
+
+
+def open_index(store_path=STORE_DIR, nlist=None, nprobe=8, rebuild=False):
+    """Load the index saved next to the embedding store, rebuilding it if the store changed"""
+    ids, matrix = open_store(store_path).active()
+    path = os.path.join(store_path, INDEX_FILE)
+    if not rebuild and os.path.exists(path):
+        try:
+            index = IVFIndex.load(path)
+            if index.fingerprint == gallery_fingerprint(ids, matrix) and (nlist is None or nlist == index.nlist):
+                index.nprobe = nprobe
+                return index
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Rebuilding ANN index: {e}")
+    index = IVFIndex(nlist, nprobe).build(ids, np.array(matrix))
+    index.save(path)
+    return index
+
+
+def synthetic_gallery(students, dim=128, groups=64, seed=0):
+    """Encodings with some group structure, about 0.9 apart between students like real ones"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(0.0, 0.045, (groups, dim))
+    gallery = centers[rng.integers(groups, size=students)] + rng.normal(0.0, 0.045, (students, dim))
+    return [f"S{i:06d}" for i in range(students)], gallery.astype(np.float32)
+
+
+if __name__ == "__main__":
+    import argparse
+    from face_gallery import FaceGallery
+
+    parser = argparse.ArgumentParser(description="Recall and latency of the IVF index against the exact scan")
+    parser.add_argument('--store', default=None, help="benchmark this embedding store instead of synthetic data")
+    parser.add_argument('--students', type=int, default=50000, help="synthetic gallery size")
+    parser.add_argument('--queries', type=int, default=500, help="number of probe encodings")
+    parser.add_argument('--nlist', type=int, default=None, help="number of cells (default: sqrt of gallery size)")
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32], help="cells scanned per query")
+    args = parser.parse_args()
+
+    if args.store:
+        ids, matrix = open_store(args.store).active()
+        matrix = np.array(matrix)
+    else:
+        ids, matrix = synthetic_gallery(args.students)
+    rng = np.random.default_rng(1)
+    # Probes are gallery students seen again with the usual same-person noise (about 0.35 away)
+    targets = rng.choice(len(ids), min(args.queries, len(ids)), replace=False)
+    probes = matrix[targets] + rng.normal(0.0, 0.031, (len(targets), matrix.shape[1])).astype(np.float32)
+
+    exact = FaceGallery(ids, matrix, metric='euclidean')
+    started = time.perf_counter()
+    exact_ids = [exact.best_matches(probe[np.newaxis, :])[0][0] for probe in probes]
+    exact_ms = (time.perf_counter() - started) / len(probes) * 1000
+
+    started = time.perf_counter()
+    index = IVFIndex(args.nlist).build(ids, matrix)
+    build_s = time.perf_counter() - started
+    print(f"{len(ids)} students, {index.nlist} cells, built in {build_s:.2f}s")
+    print(f"exact scan: {exact_ms:.3f} ms/query")
+    for nprobe in args.nprobe:
+        started = time.perf_counter()
+        found = [index.best_matches(probe[np.newaxis, :], nprobe=nprobe)[0][0] for probe in probes]
+        ann_ms = (time.perf_counter() - started) / len(probes) * 1000
+        recall = np.mean([a == b for a, b in zip(found, exact_ids)])
+        print(f"nprobe={nprobe:3d}: recall@1 {recall:.3f}, {ann_ms:.3f} ms/query ({exact_ms / ann_ms:.1f}x)")
@@ -0,0 +1,125 @@
+import numpy as np
+from datetime import date
+
+WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+
+class AttendanceMatrix:
+    """Attendance as a students x days boolean matrix
+
+    Rows follow student_ids, columns follow dates (sorted). Every statistic
+    is a vectorized reduction over the matrix.
+    """
+
+    def __init__(self, student_ids, dates, present):
+        self.student_ids = list(student_ids)
+        self.dates = list(dates)
+        self.present = np.asarray(present, dtype=bool).reshape(len(self.student_ids), len(self.dates))
+        self.row_index = {student_id: row for row, student_id in enumerate(self.student_ids)}
+
+    @classmethod
+    def from_storage(cls, storage, student_ids, start_date=None, end_date=None):
+        """Load the roster's attendance between two ISO dates (inclusive)"""
+        student_ids = [str(student_id) for student_id in student_ids]
+        dates = [date_str for date_str in storage.dates()
+                 if (not start_date or date_str >= start_date) and (not end_date or date_str <= end_date)]
+        book = getattr(storage, 'book', None)
+        if book is not None:
+            return cls(student_ids, dates, cls._unpack_book(book, student_ids, dates))
+
+        present = np.zeros((len(student_ids), len(dates)), dtype=bool)
+        rows = {student_id: row for row, student_id in enumerate(student_ids)}
+        for col, date_str in enumerate(dates):
+            day_rows = [rows[sid] for sid in storage.get_day(date_str) if sid in rows]
+            present[day_rows, col] = True
+        return cls(student_ids, dates, present)
+
+    @staticmethod
+    def _unpack_book(book, student_ids, dates):
+        # JSON storage keeps each day as a bitmap over student ordinals; unpack them straight into columns
+        n_ordinals = len(book.students)
+        by_ordinal = np.zeros((len(dates), n_ordinals + 1), dtype=bool)    # Last column: never present
+        for col, date_str in enumerate(dates):
+            bits = np.unpackbits(np.frombuffer(bytes(book.days[date_str].bits), dtype=np.uint8),
+                                 bitorder='little')[:n_ordinals]
+            by_ordinal[col, :len(bits)] = bits
+        ordinals = [book.ordinals.get(student_id, n_ordinals) for student_id in student_ids]
+        return by_ordinal[:, ordinals].T
+
+    @property
+    def n_students(self):
+        return self.present.shape[0]
+
+    @property
+    def n_days(self):
+        return self.present.shape[1]
+
+    def days_present(self):
+        return self.present.sum(axis=1)
+
+    def student_rates(self):
+        """Fraction of days present, per student"""
+        if self.n_days == 0:
+            return np.zeros(self.n_students)
+        return self.present.mean(axis=1)
+
+    def day_rates(self):
+        """Fraction of students present, per day"""
+        if self.n_students == 0:
+            return np.zeros(self.n_days)
+        return self.present.mean(axis=0)
+
+    def overall_rate(self):
+        return float(self.present.mean()) if self.present.size else 0.0
+
+    def longest_streaks(self):
+        """Longest run of consecutive recorded days present, per student"""
+        padded = np.zeros((self.n_students, self.n_days + 2), dtype=np.int8)
+        padded[:, 1:-1] = self.present
+        edges = np.diff(padded, axis=1)
+        start_rows, start_cols = np.nonzero(edges == 1)
+        _, end_cols = np.nonzero(edges == -1)
+        longest = np.zeros(self.n_students, dtype=int)
+        # Starts and ends come out in the same row-major order, so they pair up run by run
+        np.maximum.at(longest, start_rows, end_cols - start_cols)
+        return longest
+
+    def current_streaks(self):
+        """Consecutive days present up to and including the latest recorded day"""
+        if self.n_days == 0:
+            return np.zeros(self.n_students, dtype=int)
+        absent_from_end = ~self.present[:, ::-1]
+        return np.where(absent_from_end.any(axis=1), absent_from_end.argmax(axis=1), self.n_days)
+
+    def chronic_absentees(self, threshold=0.75, min_days=5):
+        """[(student_id, rate), ...] below threshold, lowest first; needs min_days of history"""
+        if self.n_days < min_days:
+            return []
+        rates = self.student_rates()
+        rows = np.nonzero(rates < threshold)[0]
+        rows = rows[np.argsort(rates[rows], kind='stable')]
+        return [(self.student_ids[row], float(rates[row])) for row in rows]
+
+    def weekday_rates(self):
+        """{weekday name: attendance rate over the recorded days falling on it}"""
+        if self.n_days == 0:
+            return {}
+        weekdays = np.array([date.fromisoformat(date_str).weekday() for date_str in self.dates])
+        present_per_day = self.present.sum(axis=0)
+        present_per_weekday = np.bincount(weekdays, weights=present_per_day, minlength=7)
+        days_per_weekday = np.bincount(weekdays, minlength=7)
+        return {WEEKDAYS[day]: float(present_per_weekday[day] / (days_per_weekday[day] * max(self.n_students, 1)))
+                for day in np.nonzero(days_per_weekday)[0]}
+
+    def student_summary(self):
+        """{student_id: {days_present, rate, longest_streak, current_streak}}"""
+        days_present = self.days_present()
+        rates = self.student_rates()
+        longest = self.longest_streaks()
+        current = self.current_streaks()
+        return {student_id: {
+                    'days_present': int(days_present[row]),
+                    'rate': float(rates[row]),
+                    'longest_streak': int(longest[row]),
+                    'current_streak': int(current[row])
+                } for row, student_id in enumerate(self.student_ids)}
@@ -0,0 +1,104 @@
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+DEFAULT_WINDOW = 50     # Seconds a student stays marked, the kiosk's original re-mark interval
+
+
+def parse_mark_time(value, fmt="%Y-%m-%d %H:%M:%S"):
+    """Epoch seconds of a stored 'last attendance' string, None if empty or malformed"""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, fmt).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class AttendanceDeduplicator:
+    """In-memory duplicate filter for attendance marks, per student and per session
+
+    admit() lets the first mark of a (session, student) pair through and
+    rejects repeats until `window` seconds have passed, so duplicates are
+    dropped before they reach storage or the network. Entries live in an
+    OrderedDict in insertion order with O(1) lookups. Marks admitted live
+    expire in that order, but seeded or recorded marks may expire sooner
+    than entries ahead of them, so every lookup also checks expiry itself.
+    The front is trimmed as new marks arrive, so memory stays close to the
+    number of students marked within one window.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW, clock=time.time):
+        self.window = window
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()    # (session, student_id) -> expires_at
+
+        # Counters
+        self.admitted = 0
+        self.rejected = 0
+
+    def _expire(self, now):
+        while self.entries:
+            key, expires_at = next(iter(self.entries.items()))
+            if expires_at > now:
+                break
+            self.entries.popitem(last=False)
+
+    def _set(self, key, expires_at):
+        self.entries.pop(key, None)
+        self.entries[key] = expires_at
+
+    def admit(self, student_id, session=None, last_marked=None):
+        """True if this mark should be written, and remember it; False for a duplicate
+
+        last_marked (epoch seconds) seeds the window from a persisted mark,
+        e.g. a last_attendance_time read back from the database.
+        """
+        now = self.clock()
+        key = (session, student_id)
+        with self.lock:
+            self._expire(now)
+            expires_at = self.entries.get(key)
+            # An expired entry stuck behind a live one counts as missing
+            if expires_at is not None and expires_at <= now:
+                self.entries.pop(key)
+                expires_at = None
+            if last_marked is not None and now - last_marked < self.window:
+                expires_at = max(expires_at or 0.0, last_marked + self.window)
+                self._set(key, expires_at)
+            if expires_at is not None:
+                self.rejected += 1
+                return False
+            self._set(key, now + self.window)
+            self.admitted += 1
+            return True
+
+    def record(self, student_id, session=None, marked_at=None):
+        """Remember a mark written elsewhere (manual marks, marks loaded from storage)"""
+        marked_at = self.clock() if marked_at is None else marked_at
+        with self.lock:
+            self._set((session, student_id), marked_at + self.window)
+
+    def seen(self, student_id, session=None):
+        """True if the student is inside their window, without recording anything"""
+        with self.lock:
+            expires_at = self.entries.get((session, student_id))
+            return expires_at is not None and expires_at > self.clock()
+
+    def forget(self, student_id, session=None):
+        """Drop a student's window, e.g. after they were marked absent again"""
+        with self.lock:
+            self.entries.pop((session, student_id), None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def stats(self):
+        with self.lock:
+            return {'admitted': self.admitted, 'rejected': self.rejected, 'tracked': len(self.entries)}
@@ -0,0 +1,86 @@
+import os
+import csv
+import gzip
+
+CSV_HEADER = ['Date', 'Student ID', 'Name', 'Status', 'Time']
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def export_dates(storage, start_date=None, end_date=None):
+    """Dates with attendance inside [start_date, end_date]; ISO strings compare in date order"""
+    return [date_str for date_str in storage.dates()
+            if (not start_date or date_str >= start_date) and (not end_date or date_str <= end_date)]
+
+
+def attendance_rows(storage, students, dates, student_ids=None):
+    """Yield one CSV row per (date, student), reading a single day at a time"""
+    if student_ids:
+        wanted = {str(student_id) for student_id in student_ids}
+        students = {student_id: student for student_id, student in students.items() if student_id in wanted}
+    for date_str in dates:
+        day_attendance = storage.get_day(date_str)
+        for student_id, student in students.items():
+            time_str = day_attendance.get(student_id)
+            yield [date_str, student_id, student['name'],
+                   "Present" if time_str is not None else "Absent", time_str or ""]
+
+
+def chunked(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def export_attendance(storage, students, filename, start_date=None, end_date=None, student_ids=None,
+                      chunk_size=5000, progress=None, cancel_event=None):
+    """Stream attendance to CSV (gzip-compressed when filename ends in .gz)
+
+    Rows are written chunk_size at a time into filename + '.part', which
+    replaces filename only once the export completes, so a cancelled or
+    failed export never leaves a truncated file behind. progress is called
+    as progress(dates_done, dates_total, rows_written). Returns rows written.
+    """
+    dates = export_dates(storage, start_date, end_date)
+    dates_done = 0
+
+    def pull_dates():
+        # Cancellation is checked each time the pipeline moves on to another day
+        nonlocal dates_done
+        for date_str in dates:
+            if cancel_event is not None and cancel_event.is_set():
+                raise ExportCancelled()
+            yield date_str
+            dates_done += 1
+
+    part_path = filename + '.part'
+    if filename.endswith('.gz'):
+        file = gzip.open(part_path, 'wt', newline='')
+    else:
+        file = open(part_path, 'w', newline='')
+
+    rows_written = 0
+    try:
+        with file:
+            writer = csv.writer(file)
+            writer.writerow(CSV_HEADER)
+            for chunk in chunked(attendance_rows(storage, students, pull_dates(), student_ids), chunk_size):
+                writer.writerows(chunk)
+                rows_written += len(chunk)
+                if progress is not None:
+                    progress(dates_done, len(dates), rows_written)
+        os.replace(part_path, filename)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    if progress is not None:
+        progress(len(dates), len(dates), rows_written)
+    return rows_written
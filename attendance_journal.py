@@ -0,0 +1,96 @@
+import os
+import json
+import threading
+from attendance_records import AttendanceBook, FORMAT_VERSION
+
+
+class AttendanceJournal:
+    """attendance.json snapshot plus an append-only log of changes made since it was written
+
+    Every mark, unmark or delete is one compact JSON line appended to the
+    log, so recording attendance costs the same no matter how much history
+    exists. After `compact_every` events (and on close) the log is folded
+    into a fresh snapshot and truncated. Attendance is held as an
+    AttendanceBook; a snapshot in the old per-day dict layout is migrated on
+    load and the original kept next to it as attendance.json.v1.bak.
+    """
+
+    def __init__(self, snapshot_path='attendance.json', log_path=None, compact_every=1000):
+        self.snapshot_path = snapshot_path
+        self.log_path = log_path or os.path.splitext(snapshot_path)[0] + '.log'
+        self.compact_every = compact_every
+        self.book = AttendanceBook()
+        self.events_since_compaction = 0
+        self.lock = threading.RLock()   # Several camera workers may mark at once
+
+    def load(self):
+        """Read the snapshot, replay the log on top of it and return the AttendanceBook"""
+        try:
+            with open(self.snapshot_path, 'r') as f:
+                text = f.read()
+        except FileNotFoundError:
+            text = ''
+        data = json.loads(text) if text.strip() else {}
+        self.book = AttendanceBook.from_json(data)
+        migrated = bool(data) and data.get('format') != FORMAT_VERSION
+        if migrated:
+            with open(self.snapshot_path + '.v1.bak', 'w') as f:
+                f.write(text)
+
+        self.events_since_compaction = 0
+        if os.path.exists(self.log_path):
+            with open(self.log_path, 'r') as f:
+                for line in f:
+                    try:
+                        self._apply(json.loads(line))
+                    except ValueError:
+                        continue    # Torn last line from a crash mid-append
+                    self.events_since_compaction += 1
+
+        if migrated or self.events_since_compaction or not os.path.exists(self.snapshot_path):
+            self.compact()
+        return self.book
+
+    def _apply(self, event):
+        op = event.get('op', 'mark')
+        if op == 'mark':
+            self.book.mark(event['d'], event['s'], bool(event['p']), event.get('t', ''), event.get('src'))
+        elif op == 'del':
+            self.book.delete_day(event['d'])
+        elif op == 'clear':
+            self.book.clear()
+
+    def _append(self, event):
+        with self.lock:
+            self._apply(event)
+            with open(self.log_path, 'a') as f:
+                f.write(json.dumps(event, separators=(',', ':')) + '\n')
+            self.events_since_compaction += 1
+            if self.events_since_compaction >= self.compact_every:
+                self.compact()
+
+    def mark(self, date_str, student_id, present, time_str='', source=None):
+        """Record one student as present or absent on a date, optionally with the camera that saw them"""
+        event = {'d': date_str, 's': str(student_id), 'p': 1 if present else 0}
+        if present:
+            event['t'] = time_str
+            if source is not None:
+                event['src'] = source
+        self._append(event)
+
+    def delete_day(self, date_str):
+        self._append({'op': 'del', 'd': date_str})
+
+    def clear(self):
+        self._append({'op': 'clear'})
+
+    def compact(self):
+        """Write the full state as a new snapshot and empty the log"""
+        with self.lock:
+            tmp_path = self.snapshot_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self.book.to_json(), f, indent=2)
+            os.replace(tmp_path, self.snapshot_path)
+            # The snapshot is in place before the log goes, so a crash in between only replays events twice
+            open(self.log_path, 'w').close()
+            self.events_since_compaction = 0
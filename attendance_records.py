@@ -0,0 +1,189 @@
+import sys
+import base64
+from array import array
+
+FORMAT_VERSION = 2
+NO_TIME = -1
+
+
+def time_to_seconds(time_str):
+    """'HH:MM:SS' -> seconds since midnight, NO_TIME when empty or malformed"""
+    try:
+        hours, minutes, seconds = (int(part) for part in time_str.split(':'))
+    except (AttributeError, ValueError):
+        return NO_TIME
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def seconds_to_time(seconds):
+    if seconds == NO_TIME:
+        return ""
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def _encode_times(times):
+    data = array('i', times)
+    if sys.byteorder == 'big':
+        data.byteswap()     # Stored little-endian on every platform
+    return base64.b64encode(data.tobytes()).decode('ascii')
+
+
+def _decode_times(text):
+    data = array('i')
+    data.frombytes(base64.b64decode(text))
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return data
+
+
+class DayRecord:
+    """Attendance for one day: a presence bitmap and a parallel array of mark times
+
+    Both are indexed by the student's ordinal in the AttendanceBook. The
+    number of students present is kept up to date on every change. Marks
+    that came from a named camera also keep it in the sparse `sources` map.
+    """
+
+    __slots__ = ('bits', 'times', 'count', 'sources')
+
+    def __init__(self, bits=None, times=None, sources=None):
+        self.bits = bits if bits is not None else bytearray()
+        self.times = times if times is not None else array('i')
+        self.sources = sources if sources is not None else {}   # ordinal -> source label
+        self.count = sum(bin(byte).count('1') for byte in self.bits)
+
+    def _grow(self, ordinal):
+        if ordinal >= len(self.bits) * 8:
+            self.bits.extend(bytes(ordinal // 8 + 1 - len(self.bits)))
+        if ordinal >= len(self.times):
+            self.times.extend([NO_TIME] * (ordinal + 1 - len(self.times)))
+
+    def is_present(self, ordinal):
+        byte = ordinal >> 3
+        return byte < len(self.bits) and bool(self.bits[byte] & (1 << (ordinal & 7)))
+
+    def time(self, ordinal):
+        return self.times[ordinal] if ordinal < len(self.times) else NO_TIME
+
+    def set(self, ordinal, present, seconds=NO_TIME, source=None):
+        self._grow(ordinal)
+        was_present = self.is_present(ordinal)
+        if present:
+            self.bits[ordinal >> 3] |= 1 << (ordinal & 7)
+            self.times[ordinal] = seconds
+        else:
+            self.bits[ordinal >> 3] &= ~(1 << (ordinal & 7)) & 0xFF
+            self.times[ordinal] = NO_TIME
+        if present and source is not None:
+            self.sources[ordinal] = source
+        else:
+            self.sources.pop(ordinal, None)
+        self.count += int(bool(present)) - int(was_present)
+
+    def present_ordinals(self):
+        for byte_index, byte in enumerate(self.bits):
+            while byte:
+                low = byte & -byte
+                yield byte_index * 8 + low.bit_length() - 1
+                byte ^= low
+
+    def to_json(self):
+        data = {'present': base64.b64encode(bytes(self.bits)).decode('ascii'),
+                'times': _encode_times(self.times)}
+        if self.sources:
+            data['sources'] = {str(ordinal): source for ordinal, source in self.sources.items()}
+        return data
+
+    @classmethod
+    def from_json(cls, data):
+        sources = {int(ordinal): source for ordinal, source in data.get('sources', {}).items()}
+        return cls(bytearray(base64.b64decode(data['present'])), _decode_times(data['times']), sources)
+
+
+class AttendanceBook:
+    """All attendance days, with students addressed by a stable ordinal"""
+
+    def __init__(self):
+        self.students = []      # ordinal -> student_id, append-only so bitmaps stay valid
+        self.ordinals = {}      # student_id -> ordinal
+        self.days = {}          # date -> DayRecord
+        self.total = 0          # Present marks across all days
+
+    def ordinal(self, student_id, create=False):
+        student_id = str(student_id)
+        ordinal = self.ordinals.get(student_id)
+        if ordinal is None and create:
+            ordinal = len(self.students)
+            self.students.append(student_id)
+            self.ordinals[student_id] = ordinal
+        return ordinal
+
+    def mark(self, date_str, student_id, present, time_str="", source=None):
+        ordinal = self.ordinal(student_id, create=present)
+        if ordinal is None:
+            return      # Marking an unknown student absent changes nothing
+        day = self.days.get(date_str)
+        if day is None:
+            day = self.days[date_str] = DayRecord()
+        before = day.count
+        day.set(ordinal, present, time_to_seconds(time_str) if present else NO_TIME, source)
+        self.total += day.count - before
+
+    def is_present(self, date_str, student_id):
+        day = self.days.get(date_str)
+        ordinal = self.ordinal(student_id)
+        return day is not None and ordinal is not None and day.is_present(ordinal)
+
+    def get_day(self, date_str):
+        """{student_id: time} of the students present on a date"""
+        day = self.days.get(date_str)
+        if day is None:
+            return {}
+        return {self.students[o]: seconds_to_time(day.time(o)) for o in day.present_ordinals()}
+
+    def get_sources(self, date_str):
+        """{student_id: source} for the marks on a date that recorded a camera"""
+        day = self.days.get(date_str)
+        if day is None:
+            return {}
+        return {self.students[ordinal]: source for ordinal, source in day.sources.items()}
+
+    def count_present(self, date_str):
+        day = self.days.get(date_str)
+        return day.count if day is not None else 0
+
+    def delete_day(self, date_str):
+        day = self.days.pop(date_str, None)
+        if day is not None:
+            self.total -= day.count
+
+    def clear(self):
+        self.days.clear()
+        self.total = 0
+
+    def to_json(self):
+        return {
+            'format': FORMAT_VERSION,
+            'students': self.students,
+            'days': {date_str: day.to_json() for date_str, day in sorted(self.days.items())}
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        """Load a snapshot, migrating the old {id: bool, "<id>_time": str} day layout"""
+        book = cls()
+        if data.get('format') == FORMAT_VERSION:
+            book.students = list(data['students'])
+            book.ordinals = {sid: ordinal for ordinal, sid in enumerate(book.students)}
+            for date_str, day_data in data['days'].items():
+                day = book.days[date_str] = DayRecord.from_json(day_data)
+                book.total += day.count
+            return book
+
+        for date_str, day_data in data.items():
+            book.days.setdefault(date_str, DayRecord())
+            for key, value in day_data.items():
+                # Only the boolean entries are presence flags, "<id>_time" keys hold their times
+                if value is True:
+                    book.mark(date_str, key, True, day_data.get(f"{key}_time", ""))
+        return book
@@ -0,0 +1,102 @@
+import threading
+from collections import Counter, defaultdict
+from datetime import date
+
+
+def week_key(date_str):
+    """'YYYY-MM-DD' -> ISO week 'YYYY-Www'"""
+    year, week, _ = date.fromisoformat(date_str).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def month_key(date_str):
+    return date_str[:7]
+
+
+class AttendanceCube:
+    """Attendance aggregates kept up to date mark by mark
+
+    The base level is per-day presence (date -> set of student ids). Every
+    change is also applied as a +1/-1 to per-student counts for its ISO week,
+    its month and the student's overall total, and each period counts its
+    class days (dates with any record). Reports read these summaries and
+    never rescan the attendance history.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.days = {}                          # date -> set of student ids present
+        self.present = defaultdict(Counter)     # ('week'|'month', key) -> Counter(student_id -> days present)
+        self.class_days = Counter()             # ('week'|'month', key) -> days with attendance
+        self.totals = Counter()                 # student_id -> days present
+
+    @classmethod
+    def from_storage(cls, storage):
+        """One pass over the stored history; later changes go through mark()"""
+        cube = cls()
+        for date_str in storage.dates():
+            for student_id in storage.get_day(date_str):
+                cube.mark(date_str, student_id, True)
+            cube._add_day(date_str)
+        return cube
+
+    def _periods(self, date_str):
+        return ('week', week_key(date_str)), ('month', month_key(date_str))
+
+    def _add_day(self, date_str):
+        if date_str not in self.days:
+            self.days[date_str] = set()
+            for period in self._periods(date_str):
+                self.class_days[period] += 1
+        return self.days[date_str]
+
+    def _count(self, date_str, student_id, delta):
+        for period in self._periods(date_str):
+            self.present[period][student_id] += delta
+        self.totals[student_id] += delta
+
+    def mark(self, date_str, student_id, present):
+        student_id = str(student_id)
+        with self.lock:
+            day = self._add_day(date_str)
+            if present and student_id not in day:
+                day.add(student_id)
+                self._count(date_str, student_id, 1)
+            elif not present and student_id in day:
+                day.discard(student_id)
+                self._count(date_str, student_id, -1)
+
+    def remove_day(self, date_str):
+        with self.lock:
+            day = self.days.pop(date_str, None)
+            if day is None:
+                return
+            for student_id in day:
+                self._count(date_str, student_id, -1)
+            for period in self._periods(date_str):
+                self.class_days[period] -= 1
+
+    def clear(self):
+        with self.lock:
+            self.days.clear()
+            self.present.clear()
+            self.class_days.clear()
+            self.totals.clear()
+
+    def period_summary(self, period, key):
+        """(class days, {student_id: days present}) for one week or month"""
+        with self.lock:
+            return self.class_days[(period, key)], dict(self.present[(period, key)])
+
+    def student_summary(self, student_id):
+        """[(month, days present, class days), ...] oldest first, plus overall totals"""
+        student_id = str(student_id)
+        with self.lock:
+            months = sorted(key for (period, key), days in self.class_days.items() if period == 'month' and days > 0)
+            rows = [(key, self.present[('month', key)][student_id], self.class_days[('month', key)])
+                    for key in months]
+            return rows, self.totals[student_id], len(self.days)
+
+
+def rate(present, total):
+    return round(100.0 * present / total, 1) if total else 0.0
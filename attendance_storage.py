@@ -0,0 +1,345 @@
+import os
+import json
+import sqlite3
+import threading
+from attendance_journal import AttendanceJournal
+from attendance_records import seconds_to_time
+
+STUDENT_FIELDS = ('name', 'email', 'phone', 'course', 'year', 'face_image')
+
+
+def _write_json(path, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+class JSONStorage:
+    """Storage backed by the original JSON files
+
+    users.json, students.json and attendance.json (with its append-only
+    journal) for FullAttendanceSystem, attendance_data.json for the per-student
+    tallies kept by the smaller apps. Attendance is held as per-day presence
+    bitmaps (attendance_records.AttendanceBook), so counts are O(1); days are
+    exposed as {student_id: time} maps of the students present.
+    """
+
+    def __init__(self, users_file='users.json', students_file='students.json',
+                 attendance_file='attendance.json', tally_file='attendance_data.json'):
+        self.users_file = users_file
+        self.students_file = students_file
+        self.attendance_file = attendance_file
+        self.tally_file = tally_file
+        self.students = None
+        self.tallies = None
+        self.journal = None
+
+    def _load_json(self, path):
+        try:
+            with open(path, 'r') as f:
+                text = f.read()
+        except FileNotFoundError:
+            return {}
+        # An empty file is treated like a missing one
+        return json.loads(text) if text.strip() else {}
+
+    # Users
+
+    def load_users(self):
+        return self._load_json(self.users_file)
+
+    def save_users(self, users):
+        _write_json(self.users_file, users)
+
+    # Students
+
+    def load_students(self):
+        if self.students is None:
+            self.students = self._load_json(self.students_file)
+        return dict(self.students)
+
+    def save_student(self, student_id, data):
+        self.load_students()
+        self.students[student_id] = data
+        _write_json(self.students_file, self.students)
+
+    def delete_student(self, student_id):
+        self.load_students()
+        if self.students.pop(student_id, None) is not None:
+            _write_json(self.students_file, self.students)
+
+    # Attendance
+
+    def _journal(self):
+        # attendance.json is only read once attendance is first needed
+        if self.journal is None:
+            self.journal = AttendanceJournal(self.attendance_file)
+            self.journal.load()
+        return self.journal
+
+    @property
+    def book(self):
+        return self._journal().book
+
+    def get_day(self, date_str):
+        """{student_id: time} of the students present on a date"""
+        with self._journal().lock:
+            return self.book.get_day(date_str)
+
+    def day_sources(self, date_str):
+        """{student_id: camera} for the marks on a date that came from a named source"""
+        with self._journal().lock:
+            return self.book.get_sources(date_str)
+
+    def is_present(self, date_str, student_id):
+        return self.book.is_present(date_str, student_id)
+
+    def count_present(self, date_str):
+        return self.book.count_present(date_str)
+
+    def total_present(self):
+        return self.book.total
+
+    def dates(self):
+        with self._journal().lock:
+            return sorted(self.book.days)
+
+    def student_history(self, student_id):
+        """{date: time} of the days a student was present"""
+        book = self.book
+        ordinal = book.ordinal(student_id)
+        if ordinal is None:
+            return {}
+        with self._journal().lock:
+            return {date_str: seconds_to_time(day.time(ordinal))
+                    for date_str, day in sorted(book.days.items()) if day.is_present(ordinal)}
+
+    def mark(self, date_str, student_id, present, time_str="", source=None):
+        self._journal().mark(date_str, student_id, present, time_str, source)
+
+    def delete_day(self, date_str):
+        if date_str in self.book.days:
+            self._journal().delete_day(date_str)
+
+    def clear_attendance(self):
+        self._journal().clear()
+
+    # Per-student tallies (attendance_data.json)
+
+    def load_tallies(self):
+        if self.tallies is None:
+            self.tallies = self._load_json(self.tally_file)
+        return self.tallies
+
+    def save_tallies(self, tallies):
+        self.tallies = tallies
+        _write_json(self.tally_file, tallies)
+
+    def record_tally(self, student_id, timestamp):
+        """Increment a student's total and set the last attendance time"""
+        tallies = self.load_tallies()
+        if student_id not in tallies:
+            return None
+        tallies[student_id]["total_attendance"] += 1
+        tallies[student_id]["last_attendance"] = timestamp
+        _write_json(self.tally_file, tallies)
+        return tallies[student_id]
+
+    def close(self):
+        if self.journal is not None:
+            self.journal.compact()
+
+
+class SQLiteStorage:
+    """Storage backed by one SQLite database in WAL mode
+
+    Students, attendance and tallies are rows, so a lookup or a report only
+    reads what it needs. One connection is shared between the Tk thread
+    and the camera thread behind a lock.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY,
+            password TEXT NOT NULL,
+            role TEXT NOT NULL,
+            name TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS students (
+            student_id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            email TEXT,
+            phone TEXT,
+            course TEXT,
+            year TEXT,
+            face_image TEXT
+        );
+        CREATE TABLE IF NOT EXISTS attendance (
+            date TEXT NOT NULL,
+            student_id TEXT NOT NULL,
+            present INTEGER NOT NULL,
+            time TEXT NOT NULL DEFAULT '',
+            source TEXT
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_attendance_date_student ON attendance (date, student_id);
+        CREATE INDEX IF NOT EXISTS idx_attendance_student ON attendance (student_id);
+        CREATE TABLE IF NOT EXISTS tallies (
+            student_id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            total_attendance INTEGER NOT NULL DEFAULT 0,
+            last_attendance TEXT NOT NULL DEFAULT ''
+        );
+    """
+
+    def __init__(self, path='attendance.db'):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        # Databases created before marks were tagged with their camera
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(attendance)")]
+        if 'source' not in columns:
+            self.conn.execute("ALTER TABLE attendance ADD COLUMN source TEXT")
+
+    def _query(self, sql, params=()):
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def _execute(self, sql, params=()):
+        with self.lock, self.conn:
+            self.conn.execute(sql, params)
+
+    def is_empty(self):
+        return not any(self._query(f"SELECT 1 FROM {table} LIMIT 1")
+                       for table in ('users', 'students', 'attendance', 'tallies'))
+
+    # Users
+
+    def load_users(self):
+        return {username: {"password": password, "role": role, "name": name}
+                for username, password, role, name in
+                self._query("SELECT username, password, role, name FROM users")}
+
+    def save_users(self, users):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM users")
+            self.conn.executemany(
+                "INSERT INTO users (username, password, role, name) VALUES (?, ?, ?, ?)",
+                [(username, user['password'], user['role'], user['name']) for username, user in users.items()])
+
+    # Students
+
+    def load_students(self):
+        rows = self._query(f"SELECT student_id, {', '.join(STUDENT_FIELDS)} FROM students")
+        return {row[0]: dict(zip(STUDENT_FIELDS, row[1:])) for row in rows}
+
+    def save_student(self, student_id, data):
+        self._execute(
+            f"INSERT OR REPLACE INTO students (student_id, {', '.join(STUDENT_FIELDS)}) "
+            f"VALUES (?, {', '.join('?' for _ in STUDENT_FIELDS)})",
+            (student_id, *(data.get(field) for field in STUDENT_FIELDS)))
+
+    def delete_student(self, student_id):
+        self._execute("DELETE FROM students WHERE student_id = ?", (student_id,))
+
+    # Attendance
+
+    def get_day(self, date_str):
+        return dict(self._query(
+            "SELECT student_id, time FROM attendance WHERE date = ? AND present = 1", (date_str,)))
+
+    def day_sources(self, date_str):
+        return dict(self._query(
+            "SELECT student_id, source FROM attendance WHERE date = ? AND present = 1 AND source IS NOT NULL",
+            (date_str,)))
+
+    def is_present(self, date_str, student_id):
+        return bool(self._query(
+            "SELECT 1 FROM attendance WHERE date = ? AND student_id = ? AND present = 1",
+            (date_str, str(student_id))))
+
+    def count_present(self, date_str):
+        return self._query("SELECT COUNT(*) FROM attendance WHERE date = ? AND present = 1", (date_str,))[0][0]
+
+    def total_present(self):
+        return self._query("SELECT COUNT(*) FROM attendance WHERE present = 1")[0][0]
+
+    def dates(self):
+        return [row[0] for row in self._query("SELECT DISTINCT date FROM attendance ORDER BY date")]
+
+    def student_history(self, student_id):
+        return dict(self._query(
+            "SELECT date, time FROM attendance WHERE student_id = ? AND present = 1 ORDER BY date",
+            (str(student_id),)))
+
+    def mark(self, date_str, student_id, present, time_str="", source=None):
+        self._execute(
+            "INSERT INTO attendance (date, student_id, present, time, source) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (date, student_id) DO UPDATE SET "
+            "present = excluded.present, time = excluded.time, source = excluded.source",
+            (date_str, str(student_id), 1 if present else 0, time_str if present else "",
+             source if present else None))
+
+    def delete_day(self, date_str):
+        self._execute("DELETE FROM attendance WHERE date = ?", (date_str,))
+
+    def clear_attendance(self):
+        self._execute("DELETE FROM attendance")
+
+    # Per-student tallies
+
+    def load_tallies(self):
+        return {student_id: {"name": name, "total_attendance": total, "last_attendance": last}
+                for student_id, name, total, last in
+                self._query("SELECT student_id, name, total_attendance, last_attendance FROM tallies")}
+
+    def save_tallies(self, tallies):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM tallies")
+            self.conn.executemany(
+                "INSERT INTO tallies (student_id, name, total_attendance, last_attendance) VALUES (?, ?, ?, ?)",
+                [(student_id, tally['name'], tally['total_attendance'], tally['last_attendance'])
+                 for student_id, tally in tallies.items()])
+
+    def record_tally(self, student_id, timestamp):
+        with self.lock, self.conn:
+            cursor = self.conn.execute(
+                "UPDATE tallies SET total_attendance = total_attendance + 1, last_attendance = ? "
+                "WHERE student_id = ?", (timestamp, student_id))
+            if cursor.rowcount == 0:
+                return None
+            name, total, last = self.conn.execute(
+                "SELECT name, total_attendance, last_attendance FROM tallies WHERE student_id = ?",
+                (student_id,)).fetchone()
+        return {"name": name, "total_attendance": total, "last_attendance": last}
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def copy_storage(source, target):
+    """Copy users, students, attendance and tallies between backends (JSON import/export)"""
+    target.save_users(source.load_users())
+    for student_id, data in source.load_students().items():
+        target.save_student(student_id, data)
+    for date_str in source.dates():
+        sources = source.day_sources(date_str)
+        for student_id, time_str in source.get_day(date_str).items():
+            target.mark(date_str, student_id, True, time_str, sources.get(student_id))
+    target.save_tallies(source.load_tallies())
+
+
+def open_storage(backend='json', sqlite_path='attendance.db'):
+    """Open the requested backend; a new SQLite database is seeded from the JSON files"""
+    if backend == 'json':
+        return JSONStorage()
+    if backend == 'sqlite':
+        storage = SQLiteStorage(sqlite_path)
+        if storage.is_empty():
+            copy_storage(JSONStorage(), storage)
+        return storage
+    raise ValueError(f"Unknown storage backend: {backend}")
@@ -0,0 +1,146 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+
+
+class AttendanceWriteQueue:
+    """Write-behind queue for per-student attendance updates
+
+    enqueue() returns immediately. Updates for the same student are merged,
+    and a worker thread sends whole batches as one multi-path update
+    (reference_fn(root).update({'<id>/<field>': value, ...})). Every enqueued
+    update is appended to a local journal first, so pending writes survive a
+    crash or an offline period and are replayed on the next start or as soon
+    as the database is reachable again.
+    """
+
+    def __init__(self, reference_fn, root_path='Students', journal_path='pending_writes.jsonl',
+                 flush_interval=2.0, batch_size=50, retry_delay=5.0):
+        self.reference_fn = reference_fn
+        self.root_path = root_path
+        self.journal_path = journal_path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.retry_delay = retry_delay
+
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.pending = OrderedDict()    # student_id -> merged fields not yet written
+        self.versions = {}              # student_id -> bumped on every enqueue
+        self.online = True
+        self.retry_at = 0.0
+        self.running = True
+
+        # Counters
+        self.flushes = 0
+        self.students_written = 0
+        self.failures = 0
+
+        self.replay()
+        self.thread = threading.Thread(target=self._worker, daemon=True)
+        self.thread.start()
+
+    def replay(self):
+        """Load writes left in the journal by a previous run"""
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue    # Torn last line from a crash mid-append
+                self._merge(record['id'], record['fields'])
+        if self.pending:
+            print(f"Replaying {len(self.pending)} pending attendance write(s)")
+
+    def _merge(self, student_id, fields):
+        self.pending.setdefault(student_id, {}).update(fields)
+        self.pending.move_to_end(student_id)
+        self.versions[student_id] = self.versions.get(student_id, 0) + 1
+
+    def enqueue(self, student_id, **fields):
+        """Queue field updates for one student"""
+        with self.lock:
+            with open(self.journal_path, 'a') as f:
+                f.write(json.dumps({'id': student_id, 'fields': fields}, separators=(',', ':')) + '\n')
+            self._merge(student_id, fields)
+            if len(self.pending) >= self.batch_size:
+                self.wakeup.set()
+
+    def pending_fields(self, student_id):
+        """Fields queued for a student but possibly not in the database yet (a copy)"""
+        with self.lock:
+            return dict(self.pending.get(student_id, {}))
+
+    def _worker(self):
+        while self.running:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            if time.time() >= self.retry_at:
+                self.flush()
+
+    def flush(self):
+        """Send pending writes in batches; returns False if the database was unreachable"""
+        while True:
+            with self.lock:
+                if not self.pending:
+                    return True
+                batch = list(self.pending.items())[:self.batch_size]
+                versions = {student_id: self.versions[student_id] for student_id, _ in batch}
+
+            updates = {}
+            for student_id, fields in batch:
+                for field, value in fields.items():
+                    updates[f'{student_id}/{field}'] = value
+
+            try:
+                self.reference_fn(self.root_path).update(updates)
+            except Exception as e:
+                with self.lock:
+                    self.failures += 1
+                    if self.online:
+                        print(f"Attendance sync offline, keeping {len(self.pending)} write(s) locally: {e}")
+                    self.online = False
+                    self.retry_at = time.time() + self.retry_delay
+                return False
+
+            with self.lock:
+                if not self.online:
+                    print("Attendance sync back online")
+                self.online = True
+                self.flushes += 1
+                self.students_written += len(batch)
+                # Students updated again while the batch was in flight stay queued
+                for student_id, version in versions.items():
+                    if self.versions.get(student_id) == version:
+                        del self.pending[student_id]
+                        del self.versions[student_id]
+                self._rewrite_journal()
+
+    def _rewrite_journal(self):
+        # Caller holds the lock; the journal shrinks to one merged line per pending student
+        tmp_path = self.journal_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            for student_id, fields in self.pending.items():
+                f.write(json.dumps({'id': student_id, 'fields': fields}, separators=(',', ':')) + '\n')
+        os.replace(tmp_path, self.journal_path)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'pending': len(self.pending),
+                'online': self.online,
+                'flushes': self.flushes,
+                'students_written': self.students_written,
+                'failures': self.failures
+            }
+
+    def close(self, timeout=5.0):
+        """Stop the worker after a last flush attempt; unsent writes stay in the journal"""
+        self.running = False
+        self.wakeup.set()
+        self.thread.join(timeout)
+        self.flush()
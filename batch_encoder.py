@@ -0,0 +1,78 @@
+import os
+import time
+import cv2
+import numpy as np
+import face_recognition
+from concurrent.futures import ProcessPoolExecutor
+
+
+def encode_image_file(path):
+    """Encode the first face in an image file, returns (path, encoding, error)
+
+    Runs inside the worker processes. Images are read there rather than in
+    the parent so only file paths and 128-d encodings cross process boundaries.
+    """
+    try:
+        img = cv2.imread(path)
+        if img is None:
+            return path, None, "unreadable image"
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        encodings = face_recognition.face_encodings(img)
+        if not encodings:
+            return path, None, "no face found"
+        return path, np.asarray(encodings[0], dtype=np.float32), None
+    except Exception as e:
+        return path, None, str(e)
+
+
+class EncodingStats:
+    """Counters for one batch encoding run"""
+
+    def __init__(self):
+        self.encoded = 0
+        self.failed = 0
+        self.started = time.time()
+        self.finished = None
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.time()) - self.started
+
+    @property
+    def faces_per_second(self):
+        return self.encoded / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self):
+        return (f"{self.encoded} encoded, {self.failed} failed in {self.elapsed:.2f}s "
+                f"({self.faces_per_second:.1f} faces/s)")
+
+
+def encode_images(paths, workers=None, chunksize=4, stats=None):
+    """Encode image files across a process pool, yielding results in input order
+
+    Yields (path, encoding, error) tuples as soon as each one is ready; a bad
+    image yields encoding=None and an error message instead of stopping the
+    batch. Pass an EncodingStats to collect throughput numbers.
+    """
+    paths = list(paths)
+    stats = stats if stats is not None else EncodingStats()
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1 or len(paths) <= 1:
+        results = map(encode_image_file, paths)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=min(workers, len(paths)))
+        results = executor.map(encode_image_file, paths, chunksize=max(1, chunksize))
+
+    try:
+        for path, encoding, error in results:
+            if encoding is None:
+                stats.failed += 1
+            else:
+                stats.encoded += 1
+            yield path, encoding, error
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        stats.finished = time.time()
@@ -0,0 +1,191 @@
+import os
+import csv
+import time
+import argparse
+import cv2
+import numpy as np
+import face_recognition
+from concurrent.futures import ProcessPoolExecutor
+from embedding_store import STORE_DIR, open_store
+from face_gallery import FaceGallery
+
+TOLERANCE = 0.6     # Same cut-off as face_recognition.compare_faces
+
+# Set in each worker process by _init_worker
+_gallery = None
+
+
+def _init_worker(store_path):
+    global _gallery
+    ids, matrix = open_store(store_path).active()
+    _gallery = FaceGallery(ids, np.array(matrix), metric='euclidean')
+
+
+def recognize_frame(task):
+    """Detect and recognize faces in one downscaled RGB frame
+
+    Runs inside the worker processes. Returns (video, timestamp_ms,
+    recognized ids, faces found, detect seconds, recognize seconds).
+    """
+    video, timestamp_ms, rgb = task
+    started = time.perf_counter()
+    locations = face_recognition.face_locations(rgb)
+    detected = time.perf_counter()
+    recognized = []
+    if locations and len(_gallery):
+        encodings = face_recognition.face_encodings(rgb, locations)
+        if encodings:
+            ids, _ = _gallery.best_matches(encodings, TOLERANCE)
+            recognized = [student_id for student_id in ids if student_id is not None]
+    finished = time.perf_counter()
+    return video, timestamp_ms, recognized, len(locations), detected - started, finished - detected
+
+
+def sample_frames(path, stride=5, scale=0.25, stats=None):
+    """Yield (path, timestamp_ms, rgb) for every stride-th frame of a video file
+
+    Skipped frames are only grabbed, never decoded into images, and
+    timestamps come from the video timeline rather than the wall clock.
+    """
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        print(f"Cannot open {path}")
+        return
+    fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+    index = 0
+    try:
+        while True:
+            started = time.perf_counter()
+            if not cap.grab():
+                break
+            if index % stride:
+                index += 1
+                if stats is not None:
+                    stats.decode_time += time.perf_counter() - started
+                continue
+            ok, frame = cap.retrieve()
+            if not ok:
+                break
+            timestamp_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
+            if timestamp_ms <= 0 and fps > 0:
+                timestamp_ms = index * 1000.0 / fps
+            small = cv2.resize(frame, (0, 0), None, scale, scale)
+            rgb = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+            if stats is not None:
+                stats.decode_time += time.perf_counter() - started
+                stats.frames_sampled += 1
+            index += 1
+            yield path, timestamp_ms, rgb
+    finally:
+        if stats is not None:
+            stats.frames_read += index
+        cap.release()
+
+
+def format_timestamp(timestamp_ms):
+    seconds, millis = divmod(int(timestamp_ms), 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}.{millis:03d}"
+
+
+class BatchStats:
+    """Decode, detect and recognize throughput for one batch run"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.finished = None
+        self.frames_read = 0
+        self.frames_sampled = 0
+        self.frames_processed = 0
+        self.faces = 0
+        self.recognized = 0
+        self.decode_time = 0.0      # Parent process
+        self.detect_time = 0.0      # Summed over workers
+        self.recognize_time = 0.0   # Summed over workers
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.time()) - self.started
+
+    def __str__(self):
+        def rate(count, seconds):
+            return count / seconds if seconds > 0 else 0.0
+        return (f"Decode:    {self.frames_read} frames read, {self.frames_sampled} sampled in "
+                f"{self.decode_time:.2f}s ({rate(self.frames_read, self.decode_time):.1f} frames/s)\n"
+                f"Detect:    {self.frames_processed} frames in {self.detect_time:.2f} worker-s "
+                f"({rate(self.frames_processed, self.detect_time):.1f} frames/s per worker)\n"
+                f"Recognize: {self.faces} faces, {self.recognized} recognized in {self.recognize_time:.2f} worker-s "
+                f"({rate(self.faces, self.recognize_time):.1f} faces/s per worker)\n"
+                f"Overall:   {rate(self.frames_processed, self.elapsed):.1f} frames/s in {self.elapsed:.2f}s")
+
+
+def process_videos(paths, stride=5, scale=0.25, workers=None, store_path=STORE_DIR, stats=None):
+    """Run recognition over the videos and return {student_id: (video, first seen ms, sightings)}"""
+    stats = stats if stats is not None else BatchStats()
+    workers = workers or os.cpu_count() or 1
+    attendance = {}
+
+    def record(result):
+        video, timestamp_ms, recognized, faces, detect_time, recognize_time = result
+        stats.frames_processed += 1
+        stats.faces += faces
+        stats.recognized += len(recognized)
+        stats.detect_time += detect_time
+        stats.recognize_time += recognize_time
+        for student_id in recognized:
+            # Results arrive in video and timeline order, so the first sighting is the earliest
+            video_seen, first_ms, count = attendance.get(student_id, (video, timestamp_ms, 0))
+            attendance[student_id] = (video_seen, first_ms, count + 1)
+
+    tasks = (task for path in paths for task in sample_frames(path, stride, scale, stats))
+    try:
+        if workers == 1:
+            _init_worker(store_path)
+            for task in tasks:
+                record(recognize_frame(task))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(store_path,)) as executor:
+                # A bounded number of frames in flight keeps memory flat however long the videos are
+                pending = []
+                for task in tasks:
+                    pending.append(executor.submit(recognize_frame, task))
+                    if len(pending) >= workers * 2:
+                        record(pending.pop(0).result())
+                for future in pending:
+                    record(future.result())
+    finally:
+        stats.finished = time.time()
+    return attendance
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mark attendance from recorded classroom videos")
+    parser.add_argument('videos', nargs='+', help="video files, processed in the order given")
+    parser.add_argument('--stride', type=int, default=5, help="process every Nth frame (default: 5)")
+    parser.add_argument('--scale', type=float, default=0.25, help="downscale factor before detection")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all CPUs)")
+    parser.add_argument('--store', default=STORE_DIR, help="embedding store directory")
+    parser.add_argument('--output', default=None, help="write the attendance list to this CSV file")
+    args = parser.parse_args()
+
+    stats = BatchStats()
+    attendance = process_videos(args.videos, max(1, args.stride), args.scale, args.workers, args.store, stats)
+
+    rows = sorted(((student_id, video, first_ms, count) for student_id, (video, first_ms, count) in attendance.items()),
+                  key=lambda row: (args.videos.index(row[1]), row[2]))
+    for student_id, video, first_ms, count in rows:
+        print(f"{student_id}: first seen {format_timestamp(first_ms)} in {os.path.basename(video)} ({count} sightings)")
+    if args.output:
+        with open(args.output, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['Student ID', 'Video', 'First Seen', 'Sightings'])
+            for student_id, video, first_ms, count in rows:
+                writer.writerow([student_id, video, format_timestamp(first_ms), count])
+        print(f"Attendance list saved as {args.output}")
+    print(stats)
+
+
+if __name__ == "__main__":
+    main()
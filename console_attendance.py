@@ -2,22 +2,28 @@ import cv2
 import numpy as np
 import os
 from datetime import datetime
-import json
+import argparse
 import threading
 import time
+from frame_grabber import FrameGrabber
+from motion_gate import MotionGate, parse_roi
+from attendance_storage import open_storage
+from attendance_dedup import AttendanceDeduplicator, parse_mark_time
 
 class ConsoleAttendanceSystem:
-    def __init__(self):
+    def __init__(self, storage_backend='json', motion_rois=None):
+        self.storage = open_storage(storage_backend)
+        self.motion_rois = motion_rois
         self.attendance_data = {}
         self.load_attendance_data()
+        # Repeat marks within the dedup window never reach storage
+        self.dedup = AttendanceDeduplicator()
         self.running = True
         
     def load_attendance_data(self):
-        """Load attendance data from JSON file"""
-        try:
-            with open('attendance_data.json', 'r') as f:
-                self.attendance_data = json.load(f)
-        except FileNotFoundError:
+        """Load attendance data from storage"""
+        self.attendance_data = self.storage.load_tallies()
+        if not self.attendance_data:
             # Initialize with sample data
             self.attendance_data = {
                 "1": {"name": "Soumyadeep Mukherjee", "total_attendance": 0, "last_attendance": ""},
@@ -29,17 +35,18 @@ class ConsoleAttendanceSystem:
             self.save_attendance_data()
     
     def save_attendance_data(self):
-        """Save attendance data to JSON file"""
-        with open('attendance_data.json', 'w') as f:
-            json.dump(self.attendance_data, f, indent=2)
+        """Save attendance data to storage"""
+        self.storage.save_tallies(self.attendance_data)
     
     def mark_attendance(self, student_id):
-        """Mark attendance for a student"""
+        """Mark attendance for a student; False if unknown or already marked within the dedup window"""
         if student_id in self.attendance_data:
+            last_marked = parse_mark_time(self.attendance_data[student_id]['last_attendance'])
+            if not self.dedup.admit(student_id, last_marked=last_marked):
+                return False
             current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            self.attendance_data[student_id]["total_attendance"] += 1
-            self.attendance_data[student_id]["last_attendance"] = current_time
-            self.save_attendance_data()
+            # Only this student's record is written
+            self.attendance_data[student_id] = self.storage.record_tally(student_id, current_time)
             return True
         return False
     
@@ -65,12 +72,14 @@ class ConsoleAttendanceSystem:
     def face_detection_thread(self):
         """Background thread for face detection"""
         try:
-            cap = cv2.VideoCapture(0)
+            cap = FrameGrabber(0)
             if not cap.isOpened():
                 print("Warning: Could not open webcam. Face detection disabled.")
                 return
                 
             face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+            # The cascade only runs on parts of the frame that changed
+            motion_gate = MotionGate(self.motion_rois)
             
             while self.running:
                 ret, frame = cap.read()
@@ -78,7 +87,7 @@ class ConsoleAttendanceSystem:
                     break
                     
                 gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                faces = face_cascade.detectMultiScale(gray, 1.1, 4)
+                faces = motion_gate.detect(gray, lambda region: face_cascade.detectMultiScale(region, 1.1, 4))
                 
                 if len(faces) > 0:
                     print(f"\n[FACE DETECTED] {len(faces)} face(s) found in camera!")
@@ -114,13 +123,16 @@ class ConsoleAttendanceSystem:
                     self.display_attendance()
                 elif command in ['1', '2', '3', '4', '5']:
                     student_id = command
-                    if self.mark_attendance(student_id):
+                    if student_id not in self.attendance_data:
+                        print(f"❌ Student ID {student_id} not found!")
+                    elif self.mark_attendance(student_id):
                         student_name = self.attendance_data[student_id]["name"]
                         print(f"\n✅ Attendance marked for {student_name} (ID: {student_id})")
                         print(f"   Total attendance: {self.attendance_data[student_id]['total_attendance']}")
                         print(f"   Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
                     else:
-                        print(f"❌ Student ID {student_id} not found!")
+                        student_name = self.attendance_data[student_id]["name"]
+                        print(f"⏳ {student_name} was already marked in the last {self.dedup.window} seconds")
                 else:
                     print("❌ Invalid command. Use 1-5, s, or q")
                     
@@ -131,9 +143,15 @@ class ConsoleAttendanceSystem:
             except Exception as e:
                 print(f"Error: {e}")
         
+        self.storage.close()
         print("Attendance System Closed!")
-        print("Final attendance data saved to attendance_data.json")
+        print("Final attendance data saved")
 
 if __name__ == "__main__":
-    system = ConsoleAttendanceSystem()
+    parser = argparse.ArgumentParser(description="Console attendance system")
+    parser.add_argument('--storage', choices=['json', 'sqlite'], default='json', help="storage backend")
+    parser.add_argument('--roi', type=parse_roi, action='append', default=None,
+                        help="only watch this part of the frame for faces, as fractions x,y,w,h (repeatable)")
+    args = parser.parse_args()
+    system = ConsoleAttendanceSystem(storage_backend=args.storage, motion_rois=args.roi)
     system.run()
@@ -0,0 +1,258 @@
+import os
+import json
+import pickle
+import hashlib
+import numpy as np
+
+STORE_DIR = 'EncodeStore'
+FORMAT_VERSION = 1
+ENCODER_VERSION = 'face_recognition-128d-v1'
+ENCODING_DIM = 128
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """SHA256 of a file's content, used to tell whether an image changed"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_json_atomic(path, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def _generation_file(name, generation):
+    """'encodings.f32' -> 'encodings.3.f32'; generation 0 keeps the plain name"""
+    if not generation:
+        return name
+    stem, ext = os.path.splitext(name)
+    return f'{stem}.{generation}{ext}'
+
+
+class EmbeddingStore:
+    """On-disk face encodings: a raw float32 matrix, an id sidecar and a JSON header
+
+    The matrix file is opened with np.memmap so startup does not copy or
+    unpickle anything. Rows freed by remove() are reused by later adds, so
+    adding or removing one student only touches that student's row.
+
+    The header names the generation of the matrix and id files it belongs
+    to. install() writes a new generation next to the current one and then
+    replaces the header, so a reader sees either the old files or the new
+    ones, never a mix.
+    """
+
+    MATRIX_FILE = 'encodings.f32'
+    IDS_FILE = 'ids.json'
+    HEADER_FILE = 'header.json'
+
+    def __init__(self, path=STORE_DIR, dim=ENCODING_DIM, encoder_version=ENCODER_VERSION):
+        self.path = path
+        self.dim = dim
+        self.encoder_version = encoder_version
+        self.row_ids = []      # Student id per matrix row, None for a free row
+        self.hashes = {}       # Student id -> content hash of the encoded image
+        self.index = {}        # Student id -> matrix row
+        self.generation = 0    # Suffix of the matrix and id files the header points at
+        self._matrix = None
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _matrix_path(self):
+        return self._file(_generation_file(self.MATRIX_FILE, self.generation))
+
+    def _ids_path(self):
+        return self._file(_generation_file(self.IDS_FILE, self.generation))
+
+    def exists(self):
+        return os.path.exists(self._file(self.HEADER_FILE))
+
+    def open(self):
+        """Load the header and id sidecar; the matrix is mapped lazily"""
+        with open(self._file(self.HEADER_FILE), 'r') as f:
+            header = json.load(f)
+        if header.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported embedding store format: {header.get('format_version')}")
+
+        self.dim = header['dim']
+        self.encoder_version = header['encoder_version']
+        self.hashes = header.get('hashes', {})
+        self.generation = header.get('generation', 0)
+        with open(self._ids_path(), 'r') as f:
+            self.row_ids = json.load(f)
+        self.index = {sid: row for row, sid in enumerate(self.row_ids) if sid is not None}
+        self._matrix = None
+        return self
+
+    def reset(self, encoder_version=None):
+        """Start an empty store, discarding any existing rows"""
+        os.makedirs(self.path, exist_ok=True)
+        if encoder_version:
+            self.encoder_version = encoder_version
+        self._release()
+        # A new empty file is swapped in, other processes keep reading the one they mapped
+        matrix_path = self._matrix_path()
+        open(matrix_path + '.tmp', 'wb').close()
+        os.replace(matrix_path + '.tmp', matrix_path)
+        self.row_ids = []
+        self.hashes = {}
+        self.index = {}
+        self._save_sidecars()
+        return self
+
+    @property
+    def matrix(self):
+        """All rows as a read-only memory map (free rows included)"""
+        if self._matrix is None and self.row_ids:
+            self._matrix = np.memmap(self._matrix_path(), dtype=np.float32,
+                                     mode='r', shape=(len(self.row_ids), self.dim))
+        return self._matrix
+
+    def _release(self):
+        # Drop the map before writing so the file can be resized on every platform
+        self._matrix = None
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, student_id):
+        return student_id in self.index
+
+    def get(self, student_id):
+        return np.array(self.matrix[self.index[student_id]])
+
+    def active(self):
+        """Return (ids, matrix) of live rows; zero-copy when there are no free rows"""
+        if not self.index:
+            return [], np.empty((0, self.dim), dtype=np.float32)
+        if len(self.index) == len(self.row_ids):
+            return list(self.row_ids), self.matrix
+        rows = [row for row, sid in enumerate(self.row_ids) if sid is not None]
+        return [self.row_ids[row] for row in rows], np.asarray(self.matrix[rows])
+
+    def add(self, student_id, encoding, image_hash=None):
+        """Add or replace a single student's encoding"""
+        self.add_many([student_id], [encoding], [image_hash])
+
+    def add_many(self, student_ids, encodings, image_hashes=None):
+        """Write several encodings, rewriting only their rows and the sidecars"""
+        if image_hashes is None:
+            image_hashes = [None] * len(student_ids)
+        self._release()
+
+        free_rows = [row for row, sid in enumerate(self.row_ids) if sid is None]
+        with open(self._matrix_path(), 'r+b') as f:
+            for student_id, encoding, image_hash in zip(student_ids, encodings, image_hashes):
+                encoding = np.asarray(encoding, dtype=np.float32).ravel()
+                if encoding.shape[0] != self.dim:
+                    raise ValueError(f"Expected a {self.dim}-d encoding for {student_id}, got {encoding.shape[0]}")
+
+                if student_id in self.index:
+                    row = self.index[student_id]
+                elif free_rows:
+                    row = free_rows.pop(0)
+                else:
+                    row = len(self.row_ids)
+                    self.row_ids.append(None)
+
+                f.seek(row * self.dim * 4)
+                f.write(encoding.tobytes())
+                self.row_ids[row] = student_id
+                self.index[student_id] = row
+                if image_hash:
+                    self.hashes[student_id] = image_hash
+
+        self._save_sidecars()
+
+    def remove(self, student_id):
+        """Free a student's row; it is reused by the next add"""
+        self.remove_many([student_id])
+
+    def remove_many(self, student_ids):
+        self._release()
+        for student_id in student_ids:
+            row = self.index.pop(student_id, None)
+            if row is not None:
+                self.row_ids[row] = None
+            self.hashes.pop(student_id, None)
+
+        # Trailing free rows can simply be cut off the end of the file, once the
+        # sidecars no longer list them so no reader maps rows past the new end
+        while self.row_ids and self.row_ids[-1] is None:
+            self.row_ids.pop()
+        self._save_sidecars()
+        with open(self._matrix_path(), 'r+b') as f:
+            f.truncate(len(self.row_ids) * self.dim * 4)
+
+    def compact(self):
+        """Rewrite the matrix without free rows"""
+        ids, matrix = self.active()
+        rebuilt = EmbeddingStore(self.path + '.rebuild', self.dim, self.encoder_version).reset()
+        rebuilt.add_many(ids, np.array(matrix), [self.hashes.get(sid) for sid in ids])
+        self._release()
+        rebuilt.install(self.path)
+        self.open()
+
+    def install(self, path):
+        """Move this store over the store at path, e.g. once a rebuild has finished
+
+        The files move in as the next generation, next to the ones in use,
+        and only the final header replace switches readers over. The
+        generation before the replaced one is deleted; the replaced one is
+        kept for readers that opened it but have not mapped its matrix yet.
+        """
+        target = EmbeddingStore(path)
+        previous = target.open().generation if target.exists() else None
+        os.makedirs(path, exist_ok=True)
+        self._release()
+        generation = 0 if previous is None else previous + 1
+        matrix_path, ids_path = self._matrix_path(), self._ids_path()
+        self.path, self.generation = path, generation
+        os.replace(matrix_path, self._matrix_path())
+        os.replace(ids_path, self._ids_path())
+        source_dir = os.path.dirname(matrix_path)
+        self._save_sidecars()
+
+        os.remove(os.path.join(source_dir, self.HEADER_FILE))
+        os.rmdir(source_dir)
+        if previous:
+            for name in (self.MATRIX_FILE, self.IDS_FILE):
+                stale = self._file(_generation_file(name, previous - 1))
+                if os.path.exists(stale):
+                    os.remove(stale)
+        return self
+
+    def _save_sidecars(self):
+        # The matrix is written first, so a crash never leaves ids pointing past its end
+        _write_json_atomic(self._ids_path(), self.row_ids)
+        _write_json_atomic(self._file(self.HEADER_FILE), {
+            'format_version': FORMAT_VERSION,
+            'generation': self.generation,
+            'encoder_version': self.encoder_version,
+            'dtype': 'float32',
+            'dim': self.dim,
+            'rows': len(self.row_ids),
+            'hashes': self.hashes
+        })
+
+    def import_pickle(self, pickle_path='EncodeFile.p'):
+        """Migrate a legacy [encodeListKnown, studentIds] pickle into this store"""
+        with open(pickle_path, 'rb') as f:
+            encodings, student_ids = pickle.load(f)
+        self.reset()
+        self.add_many(list(student_ids), encodings)
+        return self
+
+
+def open_store(path=STORE_DIR, legacy_pickle='EncodeFile.p'):
+    """Open the embedding store, migrating the old pickle on first use"""
+    store = EmbeddingStore(path)
+    if not store.exists() and os.path.exists(legacy_pickle):
+        store.import_pickle(legacy_pickle)
+    return store.open()
@@ -1,53 +1,123 @@
-import cv2
-import face_recognition
-import pickle
 import os
+import time
+import argparse
 import firebase_admin
 from firebase_admin import credentials
 from firebase_admin import db
 from firebase_admin import storage
+from embedding_store import EmbeddingStore, ENCODER_VERSION, file_hash
+from batch_encoder import encode_images, EncodingStats
 
-cred = credentials.Certificate("serviceAccountKey.json")
-firebase_admin.initialize_app(cred,{
-    'databaseURL': "https://smart-attendance-system-c2a01-default-rtdb.firebaseio.com/",
-    'storageBucket': "smart-attendance-system-c2a01.appspot.com"
-})
-
-# Importing the student images
 folderPath = 'Images'
-pathList=os.listdir(folderPath)   # Gives the list of png files in Modes
-imgList=[]
-studentIds=[]
-
-# Extracting the Student ids from the images
-for path in pathList:
-    imgList.append(cv2.imread(os.path.join(folderPath,path)))
-    studentIds.append(os.path.splitext(path)[0])
-
-    fileName= f'{folderPath}/{path}'
-    bucket=storage.bucket()
-    blob=bucket.blob(fileName)
-    blob.upload_from_filename(fileName)
 
-print(studentIds)
 
-def findEncodings(imagesList):
+def findEncodings(pathList, workers=None, chunksize=4, stats=None):
     encodeList=[]
-    for img in imagesList:
-        img=cv2.cvtColor(img,cv2.COLOR_BGR2RGB)     # Step 1
-        encode=face_recognition.face_encodings(img)[0]    # Step 2
-        encodeList.append(encode)
+    # Images are decoded and encoded in worker processes, results come back in order
+    for path,encode,error in encode_images(pathList, workers, chunksize, stats):
+        if error:
+            print(f"Skipping {path}: {error}")
+        encodeList.append(encode)     # None when the image could not be encoded
 
     return encodeList
 
-print("Encoding Started...")
-encodeListKnown=findEncodings(imgList)
-# print(encodeListKnown)
-encodeListKnownWithIds=[encodeListKnown,studentIds]
-print("Encoding Complete")
-
-# Dumping all the encodings corresponding to the student ids in a pickle file
-file=open("EncodeFile.p", "wb")
-pickle.dump(encodeListKnownWithIds,file)
-file.close()
-print("File saved")
\ No newline at end of file
+
+def main():
+    parser = argparse.ArgumentParser(description="Encode student face images into the embedding store")
+    parser.add_argument('--full', action='store_true', help="re-encode every image, not only new or changed ones")
+    parser.add_argument('--workers', type=int, default=None, help="encoder processes (default: all CPU cores)")
+    parser.add_argument('--chunksize', type=int, default=4, help="images handed to a worker at a time")
+    args = parser.parse_args()
+
+    cred = credentials.Certificate("serviceAccountKey.json")
+    firebase_admin.initialize_app(cred,{
+        'databaseURL': "https://smart-attendance-system-c2a01-default-rtdb.firebaseio.com/",
+        'storageBucket': "smart-attendance-system-c2a01.appspot.com"
+    })
+
+    startTime=time.time()
+
+    # Opening the existing store; a missing store, a new encoder or --full forces a complete re-encode
+    store=EmbeddingStore()
+    if store.exists():
+        store.open()
+    previous=store
+    fullRebuild = args.full or not store.exists() or store.encoder_version != ENCODER_VERSION
+    if fullRebuild:
+        # Encoded into a separate store, the current one keeps serving until the rebuild is complete
+        store=EmbeddingStore(store.path+'.rebuild').reset(ENCODER_VERSION)
+
+    # Importing the student images
+    pathList=os.listdir(folderPath)   # Gives the list of png files in Modes
+    fileList=[]
+    studentIds=[]
+    imageHashes=[]
+    skipped=0
+    currentIds=set()
+
+    # Extracting the Student ids from the images, keeping only new or modified ones
+    for path in pathList:
+        studentId=os.path.splitext(path)[0]
+        currentIds.add(studentId)
+
+        fileName= f'{folderPath}/{path}'
+        imageHash=file_hash(fileName)
+        if studentId in store and store.hashes.get(studentId)==imageHash:
+            skipped+=1
+            continue
+
+        fileList.append(fileName)
+        studentIds.append(studentId)
+        imageHashes.append(imageHash)
+
+        bucket=storage.bucket()
+        blob=bucket.blob(fileName)
+        blob.upload_from_filename(fileName)
+
+    print(studentIds)
+
+    print("Encoding Started...")
+    encodeStats=EncodingStats()
+    encodeListKnown=findEncodings(fileList, args.workers, args.chunksize, encodeStats)
+    # print(encodeListKnown)
+    print(f"Encoding Complete: {encodeStats}")
+
+    encodedIds=[]
+    encodedList=[]
+    encodedHashes=[]
+    failedIds=[]
+    for studentId,encode,imageHash in zip(studentIds,encodeListKnown,imageHashes):
+        if encode is None:
+            failedIds.append(studentId)
+        else:
+            encodedIds.append(studentId)
+            encodedList.append(encode)
+            encodedHashes.append(imageHash)
+
+    # Students whose image was deleted are dropped; failed images keep their old row and are retried next run
+    if fullRebuild:
+        # The rebuild starts empty, so old rows are copied over, unless they came from another encoder
+        keptIds=[sid for sid in failedIds if sid in previous] if previous.encoder_version==ENCODER_VERSION else []
+        store.add_many(keptIds,[previous.get(sid) for sid in keptIds],[previous.hashes.get(sid) for sid in keptIds])
+        lostIds=set(failedIds)-set(keptIds)
+        removedIds=[sid for sid in previous.index if sid not in currentIds or sid in lostIds]
+    else:
+        removedIds=[sid for sid in store.index if sid not in currentIds]
+        store.remove_many(removedIds)
+
+    # Writing only the changed rows, the rest of the store is left untouched
+    store.add_many(encodedIds,encodedList,encodedHashes)
+    if fullRebuild:
+        store.install(EmbeddingStore().path)
+    print("Store saved")
+
+    print(f"Encoded: {len(encodedIds)}, Skipped: {skipped}, Failed: {len(failedIds)}, "
+          f"Removed: {len(removedIds)}, Time: {time.time()-startTime:.2f}s"
+          + (" (full rebuild)" if fullRebuild else ""))
+    if failedIds:
+        print("No face found in:",failedIds)
+
+
+# Worker processes re-import this module, so nothing may run at import time
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import os
+import cv2
+import numpy as np
+
+TEMPLATE_SIZE = (100, 100)
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def template_vector(img, size=TEMPLATE_SIZE):
+    """Turn an image into a zero-mean, unit-length grayscale template vector
+
+    The dot product of two such vectors equals cv2.TM_CCOEFF_NORMED for two
+    same-sized templates, so a whole gallery can be scored with one matmul.
+    """
+    img = cv2.resize(img, size)
+    if img.ndim == 3:
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    vector = img.astype(np.float32).ravel()
+    vector -= vector.mean()
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+
+class FaceGallery:
+    """In-memory index of per-student feature vectors held in one contiguous matrix
+
+    metric='correlation' scores template vectors (higher is better),
+    metric='euclidean' scores face_recognition encodings (lower is better).
+    """
+
+    def __init__(self, ids=None, vectors=None, metric='correlation'):
+        if metric not in ('correlation', 'euclidean'):
+            raise ValueError(f"Unknown gallery metric: {metric}")
+        self.metric = metric
+        self.ids = list(ids or [])
+        if vectors is None or len(self.ids) == 0:
+            self.matrix = None
+        else:
+            self.matrix = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.index = {student_id: row for row, student_id in enumerate(self.ids)}
+        self._update_norms()
+
+    @classmethod
+    def from_folder(cls, folder='Images', student_ids=None, size=TEMPLATE_SIZE):
+        """Build a template gallery from <student_id>.<ext> files in a folder"""
+        ids = []
+        vectors = []
+        if os.path.isdir(folder):
+            for file_name in sorted(os.listdir(folder)):
+                student_id, extension = os.path.splitext(file_name)
+                if extension.lower() not in IMAGE_EXTENSIONS:
+                    continue
+                if student_ids is not None and student_id not in student_ids:
+                    continue
+                img = cv2.imread(os.path.join(folder, file_name))
+                if img is None:
+                    continue
+                ids.append(student_id)
+                vectors.append(template_vector(img, size))
+
+        return cls(ids, np.vstack(vectors) if vectors else None)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, student_id):
+        return student_id in self.index
+
+    def _update_norms(self):
+        # Squared norms are cached so euclidean scoring stays a single matmul
+        if self.matrix is not None and self.metric == 'euclidean':
+            self.sq_norms = np.einsum('ij,ij->i', self.matrix, self.matrix)
+        else:
+            self.sq_norms = None
+
+    def add(self, student_id, vector):
+        """Add or replace a single student's vector"""
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        if student_id in self.index:
+            self.matrix[self.index[student_id]] = vector
+        elif self.matrix is None:
+            self.ids = [student_id]
+            self.index = {student_id: 0}
+            self.matrix = vector[np.newaxis, :].copy()
+        else:
+            self.index[student_id] = len(self.ids)
+            self.ids.append(student_id)
+            self.matrix = np.vstack([self.matrix, vector])
+        self._update_norms()
+
+    def remove(self, student_id):
+        """Drop a student from the gallery"""
+        row = self.index.pop(student_id, None)
+        if row is None:
+            return
+        self.ids.pop(row)
+        self.matrix = np.delete(self.matrix, row, axis=0) if self.ids else None
+        self.index = {sid: i for i, sid in enumerate(self.ids)}
+        self._update_norms()
+
+    def scores(self, probes):
+        """Score probe vectors (M x D) against every gallery row, returns M x N"""
+        probes = np.atleast_2d(np.asarray(probes, dtype=np.float32))
+        if self.matrix is None:
+            return np.empty((len(probes), 0), dtype=np.float32)
+
+        if self.metric == 'correlation':
+            return probes @ self.matrix.T
+
+        # |a - b|^2 = |a|^2 + |b|^2 - 2ab, clamped against rounding below zero
+        probe_sq = np.einsum('ij,ij->i', probes, probes)[:, np.newaxis]
+        sq_dist = probe_sq + self.sq_norms[np.newaxis, :] - 2.0 * (probes @ self.matrix.T)
+        return np.sqrt(np.maximum(sq_dist, 0.0))
+
+    def best_matches(self, probes, threshold=None):
+        """Nearest student for every probe at once: (ids with None below threshold, best scores)
+
+        Probes may come from one crowded frame or several frames; the whole
+        batch costs one probes x gallery score matrix and vectorized
+        argmin/argmax and thresholding, with no per-face Python loop.
+        """
+        scores = self.scores(probes)
+        if scores.shape[1] == 0:
+            return [None] * len(scores), np.full(len(scores), np.nan, dtype=np.float32)
+
+        if self.metric == 'correlation':
+            best = scores.argmax(axis=1)
+        else:
+            best = scores.argmin(axis=1)
+        best_scores = scores[np.arange(len(scores)), best]
+        if threshold is None:
+            accepted = np.ones(len(scores), dtype=bool)
+        elif self.metric == 'correlation':
+            accepted = best_scores >= threshold
+        else:
+            accepted = best_scores <= threshold
+        ids = [self.ids[column] if ok else None for column, ok in zip(best.tolist(), accepted.tolist())]
+        return ids, best_scores
+
+    def match(self, probe, k=1, threshold=None):
+        """Return up to k (student_id, score) pairs for one probe, best first"""
+        return self.match_batch([probe], k, threshold)[0]
+
+    def match_batch(self, probes, k=1, threshold=None):
+        """Return the top-k (student_id, score) pairs for each probe"""
+        scores = self.scores(probes)
+        if scores.shape[1] == 0:
+            return [[] for _ in range(len(scores))]
+
+        k = min(k, scores.shape[1])
+        # Higher correlation is better, lower distance is better
+        ranked = -scores if self.metric == 'correlation' else scores
+        if k < scores.shape[1]:
+            top = np.argpartition(ranked, k - 1, axis=1)[:, :k]
+        else:
+            top = np.tile(np.arange(k), (len(scores), 1))
+        order = np.take_along_axis(ranked, top, axis=1).argsort(axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+
+        results = []
+        for row, columns in enumerate(top):
+            matches = []
+            for column in columns:
+                score = float(scores[row, column])
+                if threshold is not None:
+                    if self.metric == 'correlation' and score < threshold:
+                        continue
+                    if self.metric == 'euclidean' and score > threshold:
+                        continue
+                matches.append((self.ids[column], score))
+            results.append(matches)
+        return results
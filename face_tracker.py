@@ -0,0 +1,165 @@
+import itertools
+import cv2
+import numpy as np
+
+
+def box_iou(a, b):
+    """Intersection over union of two (top, right, bottom, left) boxes"""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    inter = max(0, bottom - top) * max(0, right - left)
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    union = area_a + area_b - inter
+    return inter / union if union > 0 else 0.0
+
+
+class FaceTrack:
+    """One face followed between detections"""
+
+    def __init__(self, track_id, box, student_id=None):
+        self.track_id = track_id
+        self.exact_box = tuple(float(v) for v in box)   # Sub-pixel box so tracking does not drift
+        self.student_id = student_id
+        self.points = None          # Optical-flow feature points inside the box
+        self.frames_tracked = 0
+        self.lost = False           # Optical flow could not follow it; the face may now be someone else
+
+    @property
+    def box(self):
+        """(top, right, bottom, left) in whole pixels, same order as face_recognition"""
+        return tuple(int(round(v)) for v in self.exact_box)
+
+    def __repr__(self):
+        return f"FaceTrack({self.track_id}, {self.box}, {self.student_id})"
+
+
+class FaceTracker:
+    """Detect-then-track pipeline
+
+    Full detection and recognition run only every `detect_every` frames or
+    when a track is lost; on the frames in between each box is carried
+    forward with sparse Lucas-Kanade optical flow, which costs a fraction of
+    a face_locations + face_encodings pass.
+
+    detect_fn(rgb) returns face locations, recognize_fn(rgb, locations)
+    returns one student id (or None) per location. With an IdentityCache,
+    faces whose track was resolved within its ttl keep their student id
+    and are not passed to recognize_fn again.
+    """
+
+    def __init__(self, detect_fn, recognize_fn, detect_every=10, min_points=4, max_corners=30,
+                 identity_cache=None):
+        self.detect_fn = detect_fn
+        self.recognize_fn = recognize_fn
+        self.identity_cache = identity_cache
+        self.detect_every = detect_every
+        self.min_points = min_points
+        self.max_corners = max_corners
+        self.tracks = []
+        self.prev_gray = None
+        self.frames_since_detection = 0
+        self.track_ids = itertools.count(1)
+
+        # Counters
+        self.frames = 0
+        self.detections = 0
+
+    def update(self, rgb):
+        """Process one frame and return the live tracks"""
+        gray = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+        self.frames += 1
+
+        lost = False
+        if self.tracks and self.prev_gray is not None and self.frames_since_detection < self.detect_every:
+            lost = not self._track(gray)
+
+        if lost or self.frames_since_detection >= self.detect_every or self.prev_gray is None:
+            self._detect(rgb, gray)
+        else:
+            self.frames_since_detection += 1
+
+        self.prev_gray = gray
+        return self.tracks
+
+    def _detect(self, rgb, gray):
+        self.detections += 1
+        self.frames_since_detection = 1
+        locations = self.detect_fn(rgb)
+
+        # A lost track's id (and its cached identity) is never handed on: whoever now stands
+        # in that spot may be a different student and has to be recognized again
+        followed = [track for track in self.tracks if not track.lost]
+        if self.identity_cache is not None:
+            for track in self.tracks:
+                if track.lost:
+                    self.identity_cache.forget_track(track.track_id)
+
+        track_ids = []
+        for box in locations:
+            # Keep the id of an overlapping old track so callers can follow one person
+            previous = max(followed, key=lambda t: box_iou(t.box, box), default=None)
+            if previous is not None and box_iou(previous.box, box) > 0.3:
+                track_ids.append(previous.track_id)
+            else:
+                track_ids.append(next(self.track_ids))
+
+        student_ids = [None] * len(locations)
+        if self.identity_cache is not None:
+            for i, track_id in enumerate(track_ids):
+                student_ids[i] = self.identity_cache.lookup_track(track_id)
+        pending = [i for i, student_id in enumerate(student_ids) if student_id is None]
+        if pending:
+            recognized = self.recognize_fn(rgb, [locations[i] for i in pending])
+            for i, student_id in zip(pending, recognized):
+                student_ids[i] = student_id
+                if self.identity_cache is not None:
+                    self.identity_cache.store_track(track_ids[i], student_id)
+
+        tracks = []
+        for box, track_id, student_id in zip(locations, track_ids, student_ids):
+            track = FaceTrack(track_id, box, student_id)
+            track.points = self._find_points(gray, track.box)
+            tracks.append(track)
+        self.tracks = tracks
+
+    def _find_points(self, gray, box):
+        top, right, bottom, left = box
+        mask = np.zeros_like(gray)
+        mask[max(top, 0):max(bottom, 0), max(left, 0):max(right, 0)] = 255
+        return cv2.goodFeaturesToTrack(gray, self.max_corners, 0.01, 3, mask=mask)
+
+    def _track(self, gray):
+        """Move every box with optical flow, returns False when a track is lost"""
+        height, width = gray.shape[:2]
+        for track in self.tracks:
+            # Too few features to follow: the box stays put until the next detection
+            if track.points is None or len(track.points) < self.min_points:
+                continue
+
+            new_points, status, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, track.points, None)
+            if new_points is None:
+                track.lost = True
+                return False
+            good = status.ravel() == 1
+            if good.sum() < self.min_points:
+                track.lost = True
+                return False
+            old, new = track.points[good].reshape(-1, 2), new_points[good].reshape(-1, 2)
+
+            # Median shift for translation, median spread ratio for scale
+            dx, dy = np.median(new - old, axis=0)
+            old_spread = np.median(np.linalg.norm(old - old.mean(axis=0), axis=1))
+            new_spread = np.median(np.linalg.norm(new - new.mean(axis=0), axis=1))
+            scale = new_spread / old_spread if old_spread > 0 else 1.0
+
+            top, right, bottom, left = track.exact_box
+            cx, cy = (left + right) / 2 + dx, (top + bottom) / 2 + dy
+            if not (0 <= cx < width and 0 <= cy < height):
+                track.lost = True
+                return False
+            half_w, half_h = (right - left) * scale / 2, (bottom - top) * scale / 2
+            track.exact_box = (cy - half_h, cx + half_w, cy + half_h, cx - half_w)
+            track.points = new.reshape(-1, 1, 2)
+            track.frames_tracked += 1
+        return True
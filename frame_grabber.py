@@ -0,0 +1,137 @@
+import time
+import threading
+import cv2
+
+
+class FrameGrabber:
+    """Reads a capture source on a dedicated thread and keeps only the newest frame
+
+    Drop-in for the cv2.VideoCapture calls used in this project (read,
+    isOpened, set, release), so slow detection on the consumer side never
+    stalls capture: frames that arrive before the previous one was consumed
+    replace it in the single-slot buffer and are counted as dropped.
+    With drop_frames=False the reader instead waits for each frame to be
+    consumed, so a recorded video file is processed frame by frame.
+    """
+
+    def __init__(self, source=0, width=None, height=None, start=True, drop_frames=True):
+        self.source = source
+        self.drop_frames = drop_frames
+        self.cap = cv2.VideoCapture(source)
+        if width:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        if height:
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        # Ask the driver not to queue frames of its own
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+        self.condition = threading.Condition()
+        self.frame = None
+        self.frame_time = 0.0
+        self.frame_seq = 0          # Sequence number of the frame in the slot
+        self.delivered_seq = 0      # Sequence number of the last frame handed out by read()
+        self.ended = False
+        self.running = False
+        self.thread = None
+
+        # Counters
+        self.frames_captured = 0
+        self.frames_delivered = 0
+        self.frames_dropped = 0
+        self.last_latency = 0.0
+        self.total_latency = 0.0
+        self.started_at = None
+
+        if start:
+            self.start()
+
+    def start(self):
+        """Start the reader thread"""
+        if self.running or not self.cap.isOpened():
+            return self
+        self.running = True
+        self.started_at = time.time()
+        self.thread = threading.Thread(target=self._reader, daemon=True)
+        self.thread.start()
+        return self
+
+    def _reader(self):
+        while self.running:
+            if not self.drop_frames:
+                with self.condition:
+                    self.condition.wait_for(lambda: self.frame_seq <= self.delivered_seq or not self.running)
+                if not self.running:
+                    break
+            ok, frame = self.cap.read()
+            captured_at = time.time()
+            with self.condition:
+                if not ok:
+                    self.ended = True
+                    self.condition.notify_all()
+                    break
+                # The slot still holds a frame nobody consumed: it is overwritten
+                if self.frame_seq > self.delivered_seq:
+                    self.frames_dropped += 1
+                self.frame = frame
+                self.frame_time = captured_at
+                self.frame_seq += 1
+                self.frames_captured += 1
+                self.condition.notify_all()
+
+    def isOpened(self):
+        return self.cap.isOpened() and not self.ended
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value)
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def read(self, timeout=None):
+        """Wait for a frame newer than the last one returned, like VideoCapture.read()"""
+        with self.condition:
+            if not self.condition.wait_for(
+                    lambda: self.frame_seq > self.delivered_seq or self.ended or not self.running,
+                    timeout):
+                return False, None
+            if self.frame_seq <= self.delivered_seq:
+                return False, None
+            self.delivered_seq = self.frame_seq
+            self.frames_delivered += 1
+            self.condition.notify_all()     # Wakes a reader waiting for the slot to empty
+            self.last_latency = time.time() - self.frame_time
+            self.total_latency += self.last_latency
+            return True, self.frame
+
+    def latest(self, timeout=1.0):
+        """Return the newest frame without consuming it (may repeat a frame)"""
+        with self.condition:
+            if self.frame is None:
+                self.condition.wait_for(lambda: self.frame is not None or self.ended or not self.running,
+                                        timeout)
+            if self.frame is None:
+                return False, None
+            return True, self.frame
+
+    def stats(self):
+        """Dropped-frame and capture-latency counters"""
+        with self.condition:
+            elapsed = time.time() - self.started_at if self.started_at else 0.0
+            return {
+                'captured': self.frames_captured,
+                'delivered': self.frames_delivered,
+                'dropped': self.frames_dropped,
+                'capture_fps': self.frames_captured / elapsed if elapsed > 0 else 0.0,
+                'last_latency_ms': self.last_latency * 1000,
+                'avg_latency_ms': (self.total_latency / self.frames_delivered * 1000
+                                   if self.frames_delivered else 0.0)
+            }
+
+    def release(self):
+        """Stop the reader thread and release the device"""
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=2.0)
+        self.cap.release()
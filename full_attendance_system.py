@@ -1,6 +1,6 @@
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
-import json
+from tkinter import ttk, messagebox, filedialog, simpledialog
+import argparse
 import os
 from datetime import datetime, date
 import csv
@@ -10,18 +10,43 @@ import time
 import hashlib
 from PIL import Image, ImageTk
 import numpy as np
+from face_gallery import FaceGallery, template_vector
+from frame_grabber import FrameGrabber
+from attendance_storage import open_storage
+from attendance_export import export_attendance, ExportCancelled
+from attendance_reports import AttendanceCube, week_key, month_key, rate
+from attendance_analytics import AttendanceMatrix
+from table_model import TreeTableModel
+from ui_channel import UIChannel
+from toast_notifier import ToastNotifier
+from multi_camera import MultiCameraManager, parse_source
+from motion_gate import MotionGate, parse_roi
+from attendance_dedup import AttendanceDeduplicator
+
+# Rows per page in the student and attendance tables
+TABLE_PAGE_SIZE = 200
+
+# A student is marked present once per day; the dedup session is the date
+DEDUP_WINDOW = 24 * 60 * 60
+
+# Seconds between recognition passes on one camera; repeat marks are filtered separately by the dedup window
+RECOGNITION_INTERVAL = 1
 
 class FullAttendanceSystem:
-    def __init__(self):
+    def __init__(self, storage_backend='json', camera_sources=None, motion_rois=None):
         self.root = tk.Tk()
         self.root.title("Smart Attendance Management System")
         self.root.geometry("1200x800")
         self.root.configure(bg='#f0f0f0')
         
-        # Data storage
-        self.users_file = 'users.json'
-        self.students_file = 'students.json'
-        self.attendance_file = 'attendance.json'
+        # Widget updates from the camera thread go through here
+        self.ui = UIChannel(self.root)
+        
+        # One reusable, non-modal window for attendance notifications
+        self.toast = ToastNotifier(self.root)
+        
+        # Data storage (JSON files or SQLite, both behind the same interface)
+        self.storage = open_storage(storage_backend)
         
         # Initialize data
         self.load_data()
@@ -29,20 +54,32 @@ class FullAttendanceSystem:
         # Current user
         self.current_user = None
         
-        # Face detection
+        # Face detection (camera indices, video files or stream URLs, one per entrance)
+        self.camera_sources = [parse_source(source) for source in (camera_sources or [0])]
         self.camera_running = False
+        self.cameras = None
         self.cap = None
+        self.face_gallery = None
+        self.detector = threading.local()   # One cascade per recognition worker
+        self.motion_rois = motion_rois
+        self.motion_gates = {}              # Per camera; a source never has two frames in flight
+        self.mark_lock = threading.Lock()
+        self.last_detection_time = {}
+        self.dedup = AttendanceDeduplicator(window=DEDUP_WINDOW)
+        self.dedup_session = None   # Day the dedup windows were seeded from storage for
+        self.status_hold_until = 0
+        
+        # Report aggregates, built on first use
+        self.report_cube = None
         
         # Start with login
         self.show_login()
     
     def load_data(self):
-        """Load all data from JSON files"""
+        """Load users and the student roster; attendance is queried from storage as needed"""
         # Load users
-        try:
-            with open(self.users_file, 'r') as f:
-                self.users = json.load(f)
-        except FileNotFoundError:
+        self.users = self.storage.load_users()
+        if not self.users:
             self.users = {
                 "admin": {
                     "password": self.hash_password("admin123"),
@@ -58,32 +95,54 @@ class FullAttendanceSystem:
             self.save_users()
         
         # Load students
-        try:
-            with open(self.students_file, 'r') as f:
-                self.students = json.load(f)
-        except FileNotFoundError:
-            self.students = {}
-            self.save_students()
-        
-        # Load attendance
-        try:
-            with open(self.attendance_file, 'r') as f:
-                self.attendance = json.load(f)
-        except FileNotFoundError:
-            self.attendance = {}
-            self.save_attendance()
+        self.students = self.storage.load_students()
     
     def save_users(self):
-        with open(self.users_file, 'w') as f:
-            json.dump(self.users, f, indent=2)
+        self.storage.save_users(self.users)
     
-    def save_students(self):
-        with open(self.students_file, 'w') as f:
-            json.dump(self.students, f, indent=2)
+    def save_student(self, student_id, student_data):
+        self.students[student_id] = student_data
+        self.storage.save_student(student_id, student_data)
     
-    def save_attendance(self):
-        with open(self.attendance_file, 'w') as f:
-            json.dump(self.attendance, f, indent=2)
+    def set_attendance(self, student_id, present, time_str="", source=None):
+        """Record one student's status for today, tagged with the camera that saw them if any"""
+        today = date.today().strftime("%Y-%m-%d")
+        self.storage.mark(today, student_id, present, time_str, source)
+        if present:
+            self.dedup.record(student_id, today)
+        else:
+            self.dedup.forget(student_id, today)
+        if self.report_cube is not None:
+            self.report_cube.mark(today, student_id, present)
+    
+    def admit_attendance(self, student_id, today):
+        """True the first time a student reaches auto-marking today; repeats never touch storage"""
+        if self.dedup_session != today:
+            # First mark of the day: students already present in storage start out marked
+            self.dedup_session = today
+            for present_id in self.storage.get_day(today):
+                self.dedup.record(present_id, today)
+        return self.dedup.admit(student_id, today)
+    
+    def delete_attendance_day(self, date_str):
+        self.storage.delete_day(date_str)
+        self.dedup.clear()
+        self.dedup_session = None
+        if self.report_cube is not None:
+            self.report_cube.remove_day(date_str)
+    
+    def clear_all_attendance(self):
+        self.storage.clear_attendance()
+        self.dedup.clear()
+        self.dedup_session = None
+        if self.report_cube is not None:
+            self.report_cube.clear()
+    
+    def get_report_cube(self):
+        """Build the report aggregates from storage once; marks keep them current"""
+        if self.report_cube is None:
+            self.report_cube = AttendanceCube.from_storage(self.storage)
+        return self.report_cube
     
     def hash_password(self, password):
         """Hash password using SHA256"""
@@ -213,13 +272,13 @@ class FullAttendanceSystem:
         
         total_students = len(self.students)
         today = date.today().strftime("%Y-%m-%d")
-        today_attendance = len([a for a in self.attendance.get(today, {}).values() if a])
+        today_attendance = self.storage.count_present(today)
         
         stats = [
             ("Total Students", total_students, "#3498db"),
             ("Today's Attendance", today_attendance, "#27ae60"),
             ("Attendance Rate", f"{(today_attendance/total_students*100):.1f}%" if total_students > 0 else "0%", "#f39c12"),
-            ("Total Records", len(self.attendance), "#e74c3c")
+            ("Total Records", len(self.storage.dates()), "#e74c3c")
         ]
         
         for i, (label, value, color) in enumerate(stats):
@@ -235,6 +294,17 @@ class FullAttendanceSystem:
         stats_grid.columnconfigure(1, weight=1)
         stats_grid.columnconfigure(2, weight=1)
         stats_grid.columnconfigure(3, weight=1)
+        
+        # Insights over the whole history
+        matrix = AttendanceMatrix.from_storage(self.storage, self.students)
+        if matrix.n_days > 0:
+            weekday_rates = matrix.weekday_rates()
+            lowest_day = min(weekday_rates, key=weekday_rates.get)
+            insights = (f"Average attendance: {matrix.overall_rate()*100:.1f}%    "
+                        f"Chronic absentees (<75%): {len(matrix.chronic_absentees())}    "
+                        f"Lowest day: {lowest_day} ({weekday_rates[lowest_day]*100:.1f}%)")
+            tk.Label(stats_frame, text=insights, font=('Arial', 11), 
+                    bg='white', fg='#555').pack(pady=10)
     
     def show_students(self):
         """Show student management"""
@@ -274,6 +344,10 @@ class FullAttendanceSystem:
             self.student_tree.heading(col, text=col)
             self.student_tree.column(col, width=120)
         
+        # Only the current page of students is materialized in the tree
+        self.student_table = TreeTableModel(self.student_tree, page_size=TABLE_PAGE_SIZE)
+        self.create_pager(table_frame, self.student_table)
+        
         # Scrollbar
         scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.student_tree.yview)
         self.student_tree.configure(yscrollcommand=scrollbar.set)
@@ -384,7 +458,7 @@ class FullAttendanceSystem:
         def capture_image():
             """Capture image from camera"""
             try:
-                cap = cv2.VideoCapture(0)
+                cap = FrameGrabber(0)
                 if not cap.isOpened():
                     messagebox.showerror("Error", "Cannot open camera!")
                     return
@@ -473,9 +547,9 @@ class FullAttendanceSystem:
                     messagebox.showerror("Error", f"Could not save image: {e}")
                     return
             
-            self.students[student_id] = student_data
-            self.save_students()
-            self.load_students_table()
+            self.save_student(student_id, student_data)
+            self.add_to_face_gallery(student_id)
+            self.load_students_table([student_id])
             dialog.destroy()
             messagebox.showinfo("Success", "Student added successfully!")
         
@@ -494,23 +568,46 @@ class FullAttendanceSystem:
         separator = tk.Frame(btn_frame, height=2, bg='#bdc3c7')
         separator.pack(fill=tk.X, pady=10)
     
-    def load_students_table(self):
-        """Load students into table"""
-        for item in self.student_tree.get_children():
-            self.student_tree.delete(item)
-        
-        for student_id, student in self.students.items():
-            face_status = "✅ Yes" if student.get('face_image') else "❌ No"
-            self.student_tree.insert('', 'end', values=(
-                student_id,
-                student['name'],
-                student['email'],
-                student['phone'],
-                student['course'],
-                student['year'],
-                face_status,
-                "Edit | Delete"
-            ))
+    def load_students_table(self, student_ids=None):
+        """Load students into table; with student_ids, only those rows are updated"""
+        if student_ids is None:
+            self.student_table.set_rows(
+                (student_id, self.student_row(student_id)) for student_id in self.students)
+        else:
+            for student_id in student_ids:
+                self.student_table.update_row(student_id, self.student_row(student_id))
+    
+    def student_row(self, student_id):
+        student = self.students[student_id]
+        face_status = "✅ Yes" if student.get('face_image') else "❌ No"
+        return (
+            student_id,
+            student['name'],
+            student['email'],
+            student['phone'],
+            student['course'],
+            student['year'],
+            face_status,
+            "Edit | Delete"
+        )
+    
+    def create_pager(self, parent, table):
+        """Previous/next page controls for a paged TreeTableModel"""
+        pager_frame = tk.Frame(parent, bg='white')
+        pager_frame.pack(side=tk.BOTTOM, fill=tk.X)
+        
+        page_label = tk.Label(pager_frame, text="", font=('Arial', 10), bg='white')
+        
+        tk.Button(pager_frame, text="◀", command=table.previous_page,
+                 font=('Arial', 10), width=3).pack(side=tk.LEFT, padx=5, pady=5)
+        page_label.pack(side=tk.LEFT, padx=5)
+        tk.Button(pager_frame, text="▶", command=table.next_page,
+                 font=('Arial', 10), width=3).pack(side=tk.LEFT, padx=5, pady=5)
+        
+        def show_page(page, page_count):
+            page_label.config(text=f"Page {page + 1} of {page_count} ({len(table)} students)")
+        
+        table.on_page_change = show_page
     
     def show_attendance(self):
         """Show attendance marking"""
@@ -577,6 +674,10 @@ class FullAttendanceSystem:
             self.attendance_tree.heading(col, text=col)
             self.attendance_tree.column(col, width=150)
         
+        # Only the current page of students is materialized in the tree
+        self.attendance_table = TreeTableModel(self.attendance_tree, page_size=TABLE_PAGE_SIZE)
+        self.create_pager(table_frame, self.attendance_table)
+        
         # Scrollbar
         scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.attendance_tree.yview)
         self.attendance_tree.configure(yscrollcommand=scrollbar.set)
@@ -601,232 +702,184 @@ class FullAttendanceSystem:
             self.stop_camera()
     
     def start_camera(self):
-        """Start camera"""
+        """Start every configured camera feeding the shared recognition workers"""
         try:
-            self.cap = cv2.VideoCapture(0)
-            if not self.cap.isOpened():
+            self.camera_running = True
+            self.last_detection_time = {}
+            self.motion_gates = {source: MotionGate(self.motion_rois) for source in map(str, self.camera_sources)}
+            self.status_hold_until = 0
+            self.cameras = MultiCameraManager(self.camera_sources, self.detect_faces)
+            if not self.cameras.grabbers:
+                self.stop_camera()
                 messagebox.showerror("Error", "Cannot open camera!")
                 return
+            if self.cameras.failed:
+                messagebox.showwarning("Warning", f"Could not open camera(s): {', '.join(self.cameras.failed)}")
             
-            self.camera_running = True
+            # Manual recognition peeks at the first camera
+            self.cap = self.cameras.first_grabber()
             self.camera_btn.config(text="📹 Stop Camera", bg='#e74c3c')
             self.face_status.config(text="Camera: On - Detecting faces...", fg='green')
             
-            # Start face detection
-            threading.Thread(target=self.detect_faces, daemon=True).start()
-            
         except Exception as e:
+            self.camera_running = False
             messagebox.showerror("Error", f"Camera error: {e}")
     
     def stop_camera(self):
         """Stop camera"""
         self.camera_running = False
-        if self.cap:
-            self.cap.release()
+        if self.cameras:
+            self.cameras.close()
+            self.cameras = None
+        self.cap = None
         
         self.camera_btn.config(text="📹 Start Camera", bg='#3498db')
-        self.face_status.config(text="Camera: Off", fg='black')
+        # Queued behind any status the camera workers posted before they stopped
+        self.ui.post(self.face_status.config, key='face_status', text="Camera: Off", fg='black')
     
-    def detect_faces(self):
-        """Face detection loop with automatic attendance marking"""
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-        last_detection_time = 0
-        detection_cooldown = 3  # 3 seconds cooldown between detections
-        
-        while self.camera_running:
-            try:
-                ret, frame = self.cap.read()
-                if not ret:
-                    break
-                
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                faces = face_cascade.detectMultiScale(gray, 1.1, 4)
-                
-                current_time = time.time()
-                
-                if len(faces) > 0:
-                    self.face_status.config(text=f"Camera: On - {len(faces)} face(s) detected!", fg='green')
-                    
-                    # Auto-mark attendance when face is detected (with cooldown)
-                    if current_time - last_detection_time > detection_cooldown:
-                        self.auto_mark_attendance()
-                        last_detection_time = current_time
-                else:
-                    self.face_status.config(text="Camera: On - No faces detected", fg='orange')
-                
-                time.sleep(0.5)
-                
-            except:
-                break
+    def camera_name(self, source):
+        return "Camera" if len(self.camera_sources) == 1 else f"Camera {source}"
     
-    def auto_mark_attendance(self):
-        """Automatically mark attendance when face is detected"""
-        today = date.today().strftime("%Y-%m-%d")
-        if today not in self.attendance:
-            self.attendance[today] = {}
-        
+    def detect_faces(self, source, frame):
+        """Detect faces in one frame and auto-mark attendance (runs on a recognition worker)"""
+        if not self.camera_running:
+            return
+        if not hasattr(self.detector, 'cascade'):
+            self.detector.cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        # The cascade only runs on parts of the frame that changed
+        faces = self.motion_gates[source].detect(
+            gray, lambda region: self.detector.cascade.detectMultiScale(region, 1.1, 4))
+        
+        current_time = time.time()
+        
+        # A marked message stays up for a while before frame status resumes
+        show_status = current_time >= self.status_hold_until
+        if len(faces) > 0:
+            if show_status:
+                self.ui.post(self.face_status.config, key='face_status',
+                             text=f"{self.camera_name(source)}: On - {len(faces)} face(s) detected!", fg='green')
+            
+            # Auto-mark attendance when face is detected
+            if current_time - self.last_detection_time.get(source, 0) > RECOGNITION_INTERVAL:
+                self.last_detection_time[source] = current_time
+                self.auto_mark_attendance(frame, source)
+        elif show_status:
+            self.ui.post(self.face_status.config, key='face_status',
+                         text=f"{self.camera_name(source)}: On - No faces detected", fg='orange')
+    
+    def auto_mark_attendance(self, frame=None, source=None):
+        """Automatically mark attendance when face is detected (runs on a recognition worker)"""
         current_time = datetime.now().strftime("%H:%M:%S")
-        marked_count = 0
+        marked_ids = []
         
         # Try to identify specific student if face images are available
-        identified_student = self.identify_student_from_camera()
+        identified_student = self.identify_student_from_camera(frame)
         
-        if identified_student:
-            # Mark specific identified student
-            student_id = identified_student
-            if not self.attendance[today].get(student_id, False):
-                self.attendance[today][student_id] = True
-                self.attendance[today][f"{student_id}_time"] = current_time
-                marked_count = 1
-                student_name = self.students[student_id]['name']
-                
-                # Show prominent notification with student name
-                self.show_attendance_notification(student_name, student_id, "Present")
-                self.face_status.config(text=f"✅ {student_name} identified and marked present!", fg='green')
-        else:
-            # Fallback: Mark all students as present when face is detected
-            for student_id in self.students.keys():
-                if not self.attendance[today].get(student_id, False):
-                    self.attendance[today][student_id] = True
-                    self.attendance[today][f"{student_id}_time"] = current_time
-                    marked_count += 1
-            if marked_count > 0:
-                self.face_status.config(text=f"✅ Auto-marked {marked_count} students as present!", fg='green')
-                # Show general notification
-                self.show_attendance_notification("Multiple Students", "All", "Present")
-        
-        if marked_count > 0:
-            self.save_attendance()
-            self.load_attendance_table()
+        # Two entrances can see the same student at once; only one of them marks
+        with self.mark_lock:
+            today = date.today().strftime("%Y-%m-%d")
+            
+            if identified_student:
+                # Mark specific identified student
+                student_id = identified_student
+                if self.admit_attendance(student_id, today):
+                    self.set_attendance(student_id, True, current_time, source)
+                    marked_ids.append(student_id)
+                    student_name = self.students[student_id]['name']
+                    
+                    # Show prominent notification with student name
+                    self.ui.post(self.show_attendance_notification, student_name, student_id, "Present")
+                    self.ui.post(self.face_status.config, key='face_status',
+                                 text=f"✅ {student_name} identified and marked present ({self.camera_name(source)})!",
+                                 fg='green')
+            else:
+                # Fallback: Mark all students as present when face is detected
+                for student_id in self.students.keys():
+                    if self.admit_attendance(student_id, today):
+                        self.set_attendance(student_id, True, current_time, source)
+                        marked_ids.append(student_id)
+                        # The notifier collapses these into one "N students marked" toast
+                        self.ui.post(self.show_attendance_notification,
+                                     self.students[student_id]['name'], student_id, "Present")
+                if marked_ids:
+                    self.ui.post(self.face_status.config, key='face_status',
+                                 text=f"✅ Auto-marked {len(marked_ids)} students as present!", fg='green')
+        
+        if marked_ids:
+            # Only the marked rows are refreshed; no key, posts for different students must not replace each other
+            self.ui.post(self.load_attendance_table, marked_ids)
             # Reset status after 3 seconds
-            self.root.after(3000, lambda: self.face_status.config(text="Camera: On - Face detection active", fg='green'))
+            self.status_hold_until = time.time() + 3
+            self.ui.post_later(3000, self.face_status.config, text="Camera: On - Face detection active", fg='green')
     
-    def identify_student_from_camera(self):
-        """Try to identify specific student from camera feed"""
+    def identify_student_from_camera(self, frame=None):
+        """Try to identify specific student in a frame, or in the first camera's newest frame"""
         try:
-            if not self.cap or not self.cap.isOpened():
-                return None
-            
-            ret, frame = self.cap.read()
-            if not ret:
-                return None
+            if frame is None:
+                if not self.cap or not self.cap.isOpened():
+                    return None
+                
+                # Peek at the newest frame so the detection workers keep their own frames
+                ret, frame = self.cap.latest()
+                if not ret:
+                    return None
             
-            # Simple face matching using template matching
+            # Score the frame against every enrolled template in one matrix operation
             # This is a basic implementation - for production, use face_recognition library
-            for student_id, student in self.students.items():
-                if student.get('face_image') and os.path.exists(student['face_image']):
-                    # Load student's face image
-                    student_img = cv2.imread(student['face_image'])
-                    if student_img is not None:
-                        # Resize both images to same size for comparison
-                        student_img = cv2.resize(student_img, (100, 100))
-                        frame_resized = cv2.resize(frame, (100, 100))
-                        
-                        # Convert to grayscale for comparison
-                        student_gray = cv2.cvtColor(student_img, cv2.COLOR_BGR2GRAY)
-                        frame_gray = cv2.cvtColor(frame_resized, cv2.COLOR_BGR2GRAY)
-                        
-                        # Simple template matching
-                        result = cv2.matchTemplate(frame_gray, student_gray, cv2.TM_CCOEFF_NORMED)
-                        _, max_val, _, _ = cv2.minMaxLoc(result)
-                        
-                        # If similarity is high enough, consider it a match
-                        if max_val > 0.6:  # Threshold for face matching
-                            return student_id
+            gallery = self.get_face_gallery()
+            matches = gallery.match(template_vector(frame), k=1, threshold=0.6)
+            if matches:
+                return matches[0][0]
             
             return None
         except Exception as e:
             print(f"Face identification error: {e}")
             return None
     
+    def get_face_gallery(self):
+        """Build the template gallery from the Images folder once and reuse it"""
+        if self.face_gallery is None:
+            self.face_gallery = FaceGallery.from_folder('Images', student_ids=set(self.students))
+        return self.face_gallery
+    
+    def add_to_face_gallery(self, student_id):
+        """Add a newly enrolled student's face image to an already built gallery"""
+        if self.face_gallery is None:
+            return
+        face_image = self.students[student_id].get('face_image')
+        if face_image and os.path.exists(face_image):
+            img = cv2.imread(face_image)
+            if img is not None:
+                self.face_gallery.add(student_id, template_vector(img))
+    
     def show_attendance_notification(self, student_name, student_id, status):
-        """Show prominent notification when attendance is marked"""
-        # Create notification window
-        notification = tk.Toplevel(self.root)
-        notification.title("Attendance Marked")
-        notification.geometry("400x200")
-        notification.configure(bg='#2c3e50')
-        notification.transient(self.root)
-        notification.grab_set()
-        
-        # Center the notification
-        notification.geometry("+%d+%d" % (
-            self.root.winfo_rootx() + 200, 
-            self.root.winfo_rooty() + 150
-        ))
-        
-        # Make it stay on top
-        notification.attributes('-topmost', True)
-        
-        # Main content
-        main_frame = tk.Frame(notification, bg='#2c3e50')
-        main_frame.pack(expand=True, fill=tk.BOTH, padx=20, pady=20)
-        
-        # Icon and status
-        if status == "Present":
-            icon_text = "✅"
-            status_color = "#27ae60"
-            status_text = "PRESENT"
-        elif status == "Identified":
-            icon_text = "👤"
-            status_color = "#3498db"
-            status_text = "IDENTIFIED"
-        else:
-            icon_text = "❌"
-            status_color = "#e74c3c"
-            status_text = "ABSENT"
-        
-        # Icon
-        icon_label = tk.Label(main_frame, text=icon_text, font=('Arial', 48), 
-                             bg='#2c3e50', fg=status_color)
-        icon_label.pack(pady=10)
-        
-        # Student name
-        name_label = tk.Label(main_frame, text=student_name, 
-                             font=('Arial', 20, 'bold'), 
-                             bg='#2c3e50', fg='white')
-        name_label.pack(pady=5)
-        
-        # Status
-        status_label = tk.Label(main_frame, text=f"Marked as {status_text}", 
-                               font=('Arial', 16), 
-                               bg='#2c3e50', fg=status_color)
-        status_label.pack(pady=5)
-        
-        # Time
-        time_label = tk.Label(main_frame, text=f"Time: {datetime.now().strftime('%H:%M:%S')}", 
-                             font=('Arial', 12), 
-                             bg='#2c3e50', fg='#bdc3c7')
-        time_label.pack(pady=5)
-        
-        # Auto-close after 3 seconds
-        notification.after(3000, notification.destroy)
-        
-        # Add close button
-        close_btn = tk.Button(main_frame, text="Close", 
-                             command=notification.destroy,
-                             font=('Arial', 10), bg='#34495e', fg='white')
-        close_btn.pack(pady=10)
+        """Show a toast when attendance is marked; bursts are collapsed into one summary"""
+        self.toast.notify(student_name, student_id, status)
     
-    def load_attendance_table(self):
-        """Load attendance table"""
-        for item in self.attendance_tree.get_children():
-            self.attendance_tree.delete(item)
-        
+    def load_attendance_table(self, student_ids=None):
+        """Load attendance table; with student_ids, only those rows are updated"""
         today = date.today().strftime("%Y-%m-%d")
-        today_attendance = self.attendance.get(today, {})
+        today_attendance = self.storage.get_day(today)
         
-        for student_id, student in self.students.items():
-            status = "Present" if today_attendance.get(student_id, False) else "Absent"
-            time_str = today_attendance.get(f"{student_id}_time", "")
-            
-            self.attendance_tree.insert('', 'end', values=(
-                student_id,
-                student['name'],
-                status,
-                time_str,
-                "Mark Present" if status == "Absent" else "Mark Absent"
-            ))
+        if student_ids is None:
+            self.attendance_table.set_rows(
+                (student_id, self.attendance_row(student_id, today_attendance)) for student_id in self.students)
+        else:
+            for student_id in student_ids:
+                self.attendance_table.update_row(student_id, self.attendance_row(student_id, today_attendance))
+    
+    def attendance_row(self, student_id, today_attendance):
+        status = "Present" if student_id in today_attendance else "Absent"
+        time_str = today_attendance.get(student_id, "")
+        
+        return (
+            student_id,
+            self.students[student_id]['name'],
+            status,
+            time_str,
+            "Mark Present" if status == "Absent" else "Mark Absent"
+        )
     
     def mark_attendance_from_table(self, event):
         """Mark attendance when double-clicking on table row"""
@@ -834,7 +887,7 @@ class FullAttendanceSystem:
         if selection:
             item = self.attendance_tree.item(selection[0])
             values = item['values']
-            student_id = values[0]
+            student_id = selection[0]   # Row iid; values[0] comes back as an int for numeric IDs
             student_name = values[1]
             current_status = values[2]
             
@@ -842,44 +895,31 @@ class FullAttendanceSystem:
             new_status = "Absent" if current_status == "Present" else "Present"
             
             # Update attendance data
-            today = date.today().strftime("%Y-%m-%d")
-            if today not in self.attendance:
-                self.attendance[today] = {}
-            
             if new_status == "Present":
-                self.attendance[today][student_id] = True
-                self.attendance[today][f"{student_id}_time"] = datetime.now().strftime("%H:%M:%S")
+                self.set_attendance(student_id, True, datetime.now().strftime("%H:%M:%S"))
                 # Show notification instead of messagebox
                 self.show_attendance_notification(student_name, student_id, "Present")
             else:
-                self.attendance[today][student_id] = False
-                self.attendance[today][f"{student_id}_time"] = ""
+                self.set_attendance(student_id, False)
                 # Show notification instead of messagebox
                 self.show_attendance_notification(student_name, student_id, "Absent")
             
-            # Save attendance data
-            self.save_attendance()
-            
-            # Reload table
-            self.load_attendance_table()
+            # Update just this student's row
+            self.load_attendance_table([student_id])
     
     def mark_all_present(self):
         """Mark all students as present for today"""
         today = date.today().strftime("%Y-%m-%d")
-        if today not in self.attendance:
-            self.attendance[today] = {}
-        
+        today_attendance = self.storage.get_day(today)
         current_time = datetime.now().strftime("%H:%M:%S")
         marked_count = 0
         
         for student_id in self.students.keys():
-            if not self.attendance[today].get(student_id, False):  # Only mark if not already present
-                self.attendance[today][student_id] = True
-                self.attendance[today][f"{student_id}_time"] = current_time
+            if student_id not in today_attendance:  # Only mark if not already present
+                self.set_attendance(student_id, True, current_time)
                 marked_count += 1
         
         if marked_count > 0:
-            self.save_attendance()
             self.load_attendance_table()
             messagebox.showinfo("Success", f"Marked {marked_count} students as present!")
         else:
@@ -902,9 +942,8 @@ class FullAttendanceSystem:
             # Ask if user wants to mark attendance
             result = messagebox.askyesno("Mark Attendance", f"Mark {student_name} as present?")
             if result:
+                # mark_single_attendance shows the marked notification
                 self.mark_single_attendance(identified_student, student_name, "Present")
-                # Show attendance marked notification
-                self.show_attendance_notification(student_name, identified_student, "Present")
         else:
             messagebox.showinfo("Face Recognition", "No student face recognized. Please ensure:\n- Good lighting\n- Face is clearly visible\n- Student has a face image in the system")
     
@@ -942,7 +981,7 @@ class FullAttendanceSystem:
         
         # Option 1: Delete today's attendance
         today = date.today().strftime("%Y-%m-%d")
-        today_count = len([a for a in self.attendance.get(today, {}).values() if a])
+        today_count = self.storage.count_present(today)
         
         today_btn = tk.Button(options_frame, 
                              text=f"📅 Delete Today's Attendance ({today_count} records)",
@@ -952,8 +991,7 @@ class FullAttendanceSystem:
         today_btn.pack(pady=5)
         
         # Option 2: Delete all attendance
-        total_records = sum(len([a for a in day_attendance.values() if a]) 
-                           for day_attendance in self.attendance.values())
+        total_records = self.storage.total_present()
         
         all_btn = tk.Button(options_frame, 
                            text=f"🗂️ Delete All Attendance ({total_records} records)",
@@ -980,7 +1018,7 @@ class FullAttendanceSystem:
     def confirm_delete_today(self, parent_dialog):
         """Confirm deletion of today's attendance"""
         today = date.today().strftime("%Y-%m-%d")
-        today_count = len([a for a in self.attendance.get(today, {}).values() if a])
+        today_count = self.storage.count_present(today)
         
         if today_count == 0:
             messagebox.showinfo("Info", "No attendance records found for today!")
@@ -995,17 +1033,14 @@ class FullAttendanceSystem:
         
         if result:
             # Delete today's attendance
-            if today in self.attendance:
-                del self.attendance[today]
-                self.save_attendance()
-                self.load_attendance_table()
-                messagebox.showinfo("Success", f"Deleted {today_count} attendance records for today!")
-                parent_dialog.destroy()
+            self.delete_attendance_day(today)
+            self.load_attendance_table()
+            messagebox.showinfo("Success", f"Deleted {today_count} attendance records for today!")
+            parent_dialog.destroy()
     
     def confirm_delete_all(self, parent_dialog):
         """Confirm deletion of all attendance"""
-        total_records = sum(len([a for a in day_attendance.values() if a]) 
-                           for day_attendance in self.attendance.values())
+        total_records = self.storage.total_present()
         
         if total_records == 0:
             messagebox.showinfo("Info", "No attendance records found!")
@@ -1015,13 +1050,12 @@ class FullAttendanceSystem:
         result = messagebox.askyesno("Confirm Delete", 
                                    f"Are you sure you want to delete ALL attendance records?\n\n"
                                    f"Total Records: {total_records}\n"
-                                   f"All Dates: {len(self.attendance)} days\n\n"
+                                   f"All Dates: {len(self.storage.dates())} days\n\n"
                                    f"This action cannot be undone!")
         
         if result:
             # Delete all attendance
-            self.attendance = {}
-            self.save_attendance()
+            self.clear_all_attendance()
             self.load_attendance_table()
             messagebox.showinfo("Success", f"Deleted all {total_records} attendance records!")
             parent_dialog.destroy()
@@ -1060,7 +1094,7 @@ class FullAttendanceSystem:
         date_entry.insert(0, date.today().strftime("%Y-%m-%d"))
         
         # Available dates list
-        available_dates = list(self.attendance.keys())
+        available_dates = self.storage.dates()
         if available_dates:
             tk.Label(date_dialog, text="Available dates:", 
                     font=('Arial', 10), bg='white').pack(pady=5)
@@ -1080,12 +1114,12 @@ class FullAttendanceSystem:
                 messagebox.showerror("Error", "Please enter a date!")
                 return
             
-            if selected_date not in self.attendance:
+            if selected_date not in self.storage.dates():
                 messagebox.showerror("Error", f"No attendance records found for {selected_date}!")
                 return
             
             # Count records for this date
-            date_count = len([a for a in self.attendance[selected_date].values() if a])
+            date_count = self.storage.count_present(selected_date)
             
             result = messagebox.askyesno("Confirm Delete", 
                                        f"Delete attendance for {selected_date}?\n\n"
@@ -1093,8 +1127,7 @@ class FullAttendanceSystem:
                                        f"This action cannot be undone!")
             
             if result:
-                del self.attendance[selected_date]
-                self.save_attendance()
+                self.delete_attendance_day(selected_date)
                 self.load_attendance_table()
                 messagebox.showinfo("Success", f"Deleted {date_count} records for {selected_date}!")
                 date_dialog.destroy()
@@ -1113,7 +1146,7 @@ class FullAttendanceSystem:
         if selection:
             item = self.attendance_tree.item(selection[0])
             values = item['values']
-            student_id = values[0]
+            student_id = selection[0]   # Row iid; values[0] comes back as an int for numeric IDs
             student_name = values[1]
             current_status = values[2]
             
@@ -1139,24 +1172,17 @@ class FullAttendanceSystem:
     
     def mark_single_attendance(self, student_id, student_name, status):
         """Mark attendance for a single student"""
-        today = date.today().strftime("%Y-%m-%d")
-        if today not in self.attendance:
-            self.attendance[today] = {}
-        
         if status == "Present":
-            self.attendance[today][student_id] = True
-            self.attendance[today][f"{student_id}_time"] = datetime.now().strftime("%H:%M:%S")
+            self.set_attendance(student_id, True, datetime.now().strftime("%H:%M:%S"))
             # Show notification instead of messagebox
             self.show_attendance_notification(student_name, student_id, "Present")
         else:
-            self.attendance[today][student_id] = False
-            self.attendance[today][f"{student_id}_time"] = ""
+            self.set_attendance(student_id, False)
             # Show notification instead of messagebox
             self.show_attendance_notification(student_name, student_id, "Absent")
         
-        # Save and reload
-        self.save_attendance()
-        self.load_attendance_table()
+        # Update just this student's row
+        self.load_attendance_table([student_id])
     
     def view_student_details(self, student_id):
         """View student details"""
@@ -1203,6 +1229,7 @@ Face Image: {'Yes' if student.get('face_image') else 'No'}
             ("📈 Weekly Report", self.generate_weekly_report),
             ("📋 Monthly Report", self.generate_monthly_report),
             ("👥 Student Report", self.generate_student_report),
+            ("⚠️ Absentee Report", self.generate_absentee_report),
             ("📁 Export CSV", self.export_csv)
         ]
         
@@ -1221,45 +1248,227 @@ Face Image: {'Yes' if student.get('face_image') else 'No'}
             writer = csv.writer(file)
             writer.writerow(['Student ID', 'Name', 'Status', 'Time'])
             
-            today_attendance = self.attendance.get(today, {})
+            today_attendance = self.storage.get_day(today)
             for student_id, student in self.students.items():
-                status = "Present" if today_attendance.get(student_id, False) else "Absent"
-                time_str = today_attendance.get(f"{student_id}_time", "")
+                status = "Present" if student_id in today_attendance else "Absent"
+                time_str = today_attendance.get(student_id, "")
                 writer.writerow([student_id, student['name'], status, time_str])
         
         messagebox.showinfo("Success", f"Daily report saved as {filename}")
     
+    def write_period_report(self, period, key, filename):
+        """Per-student attendance for one week or month, read from the aggregates"""
+        class_days, present = self.get_report_cube().period_summary(period, key)
+        
+        with open(filename, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['Student ID', 'Name', 'Days Present', 'Class Days', 'Attendance %'])
+            
+            for student_id, student in self.students.items():
+                days_present = present.get(student_id, 0)
+                writer.writerow([student_id, student['name'], days_present, class_days,
+                                 rate(days_present, class_days)])
+        
+        return class_days
+    
     def generate_weekly_report(self):
         """Generate weekly report"""
-        messagebox.showinfo("Info", "Weekly report feature coming soon!")
+        week = week_key(date.today().strftime("%Y-%m-%d"))
+        filename = f"weekly_report_{week}.csv"
+        class_days = self.write_period_report('week', week, filename)
+        messagebox.showinfo("Success", f"Weekly report ({class_days} class days) saved as {filename}")
     
     def generate_monthly_report(self):
         """Generate monthly report"""
-        messagebox.showinfo("Info", "Monthly report feature coming soon!")
+        month = month_key(date.today().strftime("%Y-%m-%d"))
+        filename = f"monthly_report_{month}.csv"
+        class_days = self.write_period_report('month', month, filename)
+        messagebox.showinfo("Success", f"Monthly report ({class_days} class days) saved as {filename}")
     
     def generate_student_report(self):
         """Generate individual student report"""
-        messagebox.showinfo("Info", "Student report feature coming soon!")
+        student_id = simpledialog.askstring("Student Report", "Student ID:", parent=self.root)
+        if not student_id:
+            return
+        student_id = student_id.strip()
+        if student_id not in self.students:
+            messagebox.showerror("Error", f"Student {student_id} not found!")
+            return
+        
+        months, total_present, total_days = self.get_report_cube().student_summary(student_id)
+        filename = f"student_report_{student_id}.csv"
+        
+        with open(filename, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['Student ID', student_id])
+            writer.writerow(['Name', self.students[student_id]['name']])
+            writer.writerow([])
+            writer.writerow(['Month', 'Days Present', 'Class Days', 'Attendance %'])
+            for month, days_present, class_days in months:
+                writer.writerow([month, days_present, class_days, rate(days_present, class_days)])
+            writer.writerow(['Total', total_present, total_days, rate(total_present, total_days)])
+        
+        messagebox.showinfo("Success", f"Student report saved as {filename}\n\n"
+                                       f"Overall attendance: {rate(total_present, total_days)}%")
+    
+    def generate_absentee_report(self):
+        """Generate per-student rates and streaks, lowest attendance first"""
+        matrix = AttendanceMatrix.from_storage(self.storage, self.students)
+        if matrix.n_days == 0:
+            messagebox.showinfo("Info", "No attendance records found!")
+            return
+        
+        summary = matrix.student_summary()
+        chronic = {student_id for student_id, _ in matrix.chronic_absentees()}
+        filename = f"absentee_report_{date.today().strftime('%Y-%m-%d')}.csv"
+        
+        with open(filename, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['Student ID', 'Name', 'Days Present', 'Class Days', 'Attendance %',
+                             'Longest Streak', 'Current Streak', 'Chronic Absentee'])
+            for student_id in sorted(summary, key=lambda sid: summary[sid]['rate']):
+                stats = summary[student_id]
+                writer.writerow([student_id, self.students[student_id]['name'], stats['days_present'],
+                                 matrix.n_days, round(stats['rate'] * 100, 1), stats['longest_streak'],
+                                 stats['current_streak'], "Yes" if student_id in chronic else "No"])
+            
+            writer.writerow([])
+            writer.writerow(['Weekday', 'Attendance %'])
+            for weekday, weekday_rate in matrix.weekday_rates().items():
+                writer.writerow([weekday, round(weekday_rate * 100, 1)])
+        
+        messagebox.showinfo("Success", f"Absentee report saved as {filename}\n\n"
+                                       f"Chronic absentees (<75%): {len(chronic)}")
     
     def export_csv(self):
-        """Export all data to CSV"""
-        filename = filedialog.asksaveasfilename(
-            defaultextension=".csv",
-            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
-        )
+        """Export attendance to CSV"""
+        # Filter dialog
+        export_dialog = tk.Toplevel(self.root)
+        export_dialog.title("Export Attendance")
+        export_dialog.geometry("380x300")
+        export_dialog.configure(bg='white')
+        export_dialog.transient(self.root)
+        export_dialog.grab_set()
+        export_dialog.resizable(False, False)
+        
+        export_dialog.geometry("+%d+%d" % (
+            self.root.winfo_rootx() + 150, 
+            self.root.winfo_rooty() + 150
+        ))
         
-        if filename:
-            with open(filename, 'w', newline='') as file:
-                writer = csv.writer(file)
-                writer.writerow(['Date', 'Student ID', 'Name', 'Status', 'Time'])
-                
-                for date_str, day_attendance in self.attendance.items():
-                    for student_id, student in self.students.items():
-                        status = "Present" if day_attendance.get(student_id, False) else "Absent"
-                        time_str = day_attendance.get(f"{student_id}_time", "")
-                        writer.writerow([date_str, student_id, student['name'], status, time_str])
+        tk.Label(export_dialog, text="📤 Export Attendance", 
+                font=('Arial', 14, 'bold'), bg='white').pack(pady=15)
+        
+        filter_frame = tk.Frame(export_dialog, bg='white')
+        filter_frame.pack(pady=10)
+        
+        available_dates = self.storage.dates()
+        entries = {}
+        for row, (label, default) in enumerate([
+            ("From (YYYY-MM-DD):", available_dates[0] if available_dates else ""),
+            ("To (YYYY-MM-DD):", available_dates[-1] if available_dates else ""),
+            ("Student IDs (comma separated):", "")
+        ]):
+            tk.Label(filter_frame, text=label, font=('Arial', 10), bg='white').grid(
+                row=row, column=0, sticky='w', pady=5)
+            entry = tk.Entry(filter_frame, font=('Arial', 10), width=15)
+            entry.grid(row=row, column=1, pady=5, padx=5)
+            entry.insert(0, default)
+            entries[row] = entry
+        
+        tk.Label(export_dialog, text="Leave student IDs empty to export everyone.\n"
+                                     "Save as .csv.gz for compressed output.",
+                font=('Arial', 9), bg='white', fg='#666').pack()
+        
+        def start_export():
+            start_date = entries[0].get().strip() or None
+            end_date = entries[1].get().strip() or None
+            for value in (start_date, end_date):
+                if value:
+                    try:
+                        datetime.strptime(value, "%Y-%m-%d")
+                    except ValueError:
+                        messagebox.showerror("Error", f"Invalid date: {value}")
+                        return
+            student_ids = [sid.strip() for sid in entries[2].get().split(',') if sid.strip()]
             
-            messagebox.showinfo("Success", f"Data exported to {filename}")
+            filename = filedialog.asksaveasfilename(
+                defaultextension=".csv",
+                filetypes=[("CSV files", "*.csv"), ("Compressed CSV", "*.csv.gz"), ("All files", "*.*")]
+            )
+            if filename:
+                export_dialog.destroy()
+                self.run_export(filename, start_date, end_date, student_ids)
+        
+        btn_frame = tk.Frame(export_dialog, bg='white')
+        btn_frame.pack(pady=15)
+        
+        tk.Button(btn_frame, text="📤 Export", command=start_export,
+                 font=('Arial', 12, 'bold'), bg='#27ae60', fg='white',
+                 width=10).pack(side=tk.LEFT, padx=5)
+        
+        tk.Button(btn_frame, text="❌ Cancel", command=export_dialog.destroy,
+                 font=('Arial', 12), bg='#95a5a6', fg='white',
+                 width=10).pack(side=tk.LEFT, padx=5)
+    
+    def run_export(self, filename, start_date=None, end_date=None, student_ids=None):
+        """Stream the export on a worker thread with a progress dialog"""
+        progress_dialog = tk.Toplevel(self.root)
+        progress_dialog.title("Exporting")
+        progress_dialog.geometry("350x160")
+        progress_dialog.configure(bg='white')
+        progress_dialog.transient(self.root)
+        progress_dialog.resizable(False, False)
+        
+        progress_dialog.geometry("+%d+%d" % (
+            self.root.winfo_rootx() + 150, 
+            self.root.winfo_rooty() + 150
+        ))
+        
+        status_label = tk.Label(progress_dialog, text="Preparing export...", 
+                               font=('Arial', 11), bg='white')
+        status_label.pack(pady=15)
+        
+        progress_bar = ttk.Progressbar(progress_dialog, length=280, mode='determinate')
+        progress_bar.pack(pady=5)
+        
+        cancel_event = threading.Event()
+        # Written by the worker, read by poll() on the Tk thread
+        state = {'progress': (0, 0, 0), 'done': False, 'error': None}
+        
+        def report(dates_done, dates_total, rows_written):
+            state['progress'] = (dates_done, dates_total, rows_written)
+        
+        def worker():
+            try:
+                export_attendance(self.storage, dict(self.students), filename, start_date, end_date,
+                                  student_ids, progress=report, cancel_event=cancel_event)
+            except Exception as e:
+                state['error'] = e
+            state['done'] = True
+        
+        def poll():
+            dates_done, dates_total, rows_written = state['progress']
+            if dates_total:
+                progress_bar['value'] = 100 * dates_done / dates_total
+            status_label.config(text=f"{dates_done}/{dates_total} days, {rows_written} rows")
+            if not state['done']:
+                self.root.after(100, poll)
+                return
+            progress_dialog.destroy()
+            if isinstance(state['error'], ExportCancelled):
+                messagebox.showinfo("Export", "Export cancelled")
+            elif state['error'] is not None:
+                messagebox.showerror("Error", f"Export failed: {state['error']}")
+            else:
+                messagebox.showinfo("Success", f"Exported {rows_written} rows to {filename}")
+        
+        tk.Button(progress_dialog, text="❌ Cancel", command=cancel_event.set,
+                 font=('Arial', 11), bg='#95a5a6', fg='white',
+                 width=10).pack(pady=10)
+        
+        threading.Thread(target=worker, daemon=True).start()
+        self.root.after(100, poll)
     
     def show_settings(self):
         """Show settings"""
@@ -1310,7 +1519,7 @@ Face Image: {'Yes' if student.get('face_image') else 'No'}
         """Show camera preview in label"""
         def update_preview():
             if cap.isOpened():
-                ret, frame = cap.read()
+                ret, frame = cap.latest()
                 if ret:
                     # Convert BGR to RGB
                     frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
@@ -1330,7 +1539,7 @@ Face Image: {'Yes' if student.get('face_image') else 'No'}
     def capture_face_image(self, cap, camera_dialog, selected_image_path, img_label):
         """Capture face image from camera"""
         try:
-            ret, frame = cap.read()
+            ret, frame = cap.latest()
             if ret:
                 # Save captured image
                 import tempfile
@@ -1423,7 +1632,8 @@ Developed with Python & Tkinter
     def clear_window(self):
         """Clear all widgets from window"""
         for widget in self.root.winfo_children():
-            widget.destroy()
+            if widget is not self.toast.window:     # Pooled toast outlives screen changes
+                widget.destroy()
     
     def logout(self):
         """Logout user"""
@@ -1433,8 +1643,20 @@ Developed with Python & Tkinter
     def run(self):
         """Start the application"""
         self.root.mainloop()
+        if self.cameras:
+            self.cameras.close()
+        # Leave the storage in a clean state (the JSON backend compacts its journal)
+        self.storage.close()
 
 if __name__ == "__main__":
-    app = FullAttendanceSystem()
+    parser = argparse.ArgumentParser(description="Smart Attendance Management System")
+    parser.add_argument('--storage', choices=['json', 'sqlite'], default='json',
+                        help="storage backend (a new SQLite database is seeded from the JSON files)")
+    parser.add_argument('--cameras', nargs='+', default=['0'],
+                        help="camera indices, video files or RTSP URLs, e.g. --cameras 0 1 rtsp://door3/stream")
+    parser.add_argument('--roi', type=parse_roi, action='append', default=None,
+                        help="only watch this part of the frame for faces, as fractions x,y,w,h (repeatable)")
+    args = parser.parse_args()
+    app = FullAttendanceSystem(storage_backend=args.storage, camera_sources=args.cameras, motion_rois=args.roi)
     app.run()
 image.png
\ No newline at end of file
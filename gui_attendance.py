@@ -2,16 +2,25 @@ import cv2
 import numpy as np
 import os
 from datetime import datetime
-import json
+import argparse
 import tkinter as tk
 from tkinter import ttk, messagebox
 import threading
-import time
+from frame_grabber import FrameGrabber
+from motion_gate import MotionGate, parse_roi
+from attendance_storage import open_storage
+from attendance_dedup import AttendanceDeduplicator, parse_mark_time
+from table_model import TreeTableModel
+from ui_channel import UIChannel
 
 class GUIAttendanceSystem:
-    def __init__(self):
+    def __init__(self, storage_backend='json', motion_rois=None):
+        self.storage = open_storage(storage_backend)
+        self.motion_rois = motion_rois
         self.attendance_data = {}
         self.load_attendance_data()
+        # Repeat marks within the dedup window never reach storage
+        self.dedup = AttendanceDeduplicator()
         self.cap = None
         self.face_cascade = None
         self.running = False
@@ -22,14 +31,15 @@ class GUIAttendanceSystem:
         self.root.geometry("800x600")
         self.root.configure(bg='#2c3e50')
         
+        # Widget updates from the detection thread go through here
+        self.ui = UIChannel(self.root)
+        
         self.setup_gui()
         
     def load_attendance_data(self):
-        """Load attendance data from JSON file"""
-        try:
-            with open('attendance_data.json', 'r') as f:
-                self.attendance_data = json.load(f)
-        except FileNotFoundError:
+        """Load attendance data from storage"""
+        self.attendance_data = self.storage.load_tallies()
+        if not self.attendance_data:
             # Initialize with sample data
             self.attendance_data = {
                 "1": {"name": "Soumyadeep Mukherjee", "total_attendance": 0, "last_attendance": ""},
@@ -41,9 +51,8 @@ class GUIAttendanceSystem:
             self.save_attendance_data()
     
     def save_attendance_data(self):
-        """Save attendance data to JSON file"""
-        with open('attendance_data.json', 'w') as f:
-            json.dump(self.attendance_data, f, indent=2)
+        """Save attendance data to storage"""
+        self.storage.save_tallies(self.attendance_data)
     
     def setup_gui(self):
         """Setup the GUI interface"""
@@ -122,6 +131,7 @@ class GUIAttendanceSystem:
         for col in columns:
             self.tree.heading(col, text=col)
             self.tree.column(col, width=150)
+        self.table = TreeTableModel(self.tree)
         
         # Scrollbar
         scrollbar = ttk.Scrollbar(display_frame, orient=tk.VERTICAL, command=self.tree.yview)
@@ -139,21 +149,24 @@ class GUIAttendanceSystem:
                                   bg='#2c3e50', fg='#e74c3c')
         self.face_status.pack(pady=5)
     
-    def update_display(self):
-        """Update the attendance display"""
-        # Clear existing items
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        # Add current data
-        for student_id, data in self.attendance_data.items():
-            last_attendance = data['last_attendance'] if data['last_attendance'] else "Never"
-            self.tree.insert('', 'end', values=(
-                student_id, 
-                data['name'], 
-                data['total_attendance'], 
-                last_attendance
-            ))
+    def update_display(self, student_ids=None):
+        """Update the attendance display; with student_ids, only those rows change"""
+        if student_ids is None:
+            self.table.set_rows(
+                (student_id, self.display_row(student_id)) for student_id in self.attendance_data)
+        else:
+            for student_id in student_ids:
+                self.table.update_row(student_id, self.display_row(student_id))
+    
+    def display_row(self, student_id):
+        data = self.attendance_data[student_id]
+        last_attendance = data['last_attendance'] if data['last_attendance'] else "Never"
+        return (
+            student_id, 
+            data['name'], 
+            data['total_attendance'], 
+            last_attendance
+        )
     
     def toggle_camera(self):
         """Start or stop camera"""
@@ -165,7 +178,7 @@ class GUIAttendanceSystem:
     def start_camera(self):
         """Start camera and face detection"""
         try:
-            self.cap = cv2.VideoCapture(0)
+            self.cap = FrameGrabber(0)
             if not self.cap.isOpened():
                 messagebox.showerror("Error", "Could not open camera!")
                 return
@@ -192,10 +205,13 @@ class GUIAttendanceSystem:
         self.camera_btn.config(text="📹 Start Camera", bg='#3498db')
         self.camera_label.config(text="Camera: Stopped", fg='#e74c3c')
         self.status_label.config(text="Status: Ready", fg='#27ae60')
-        self.face_status.config(text="Face Detection: Inactive", fg='#e74c3c')
+        # Queued behind any status the detection thread posted before it stopped
+        self.ui.post(self.face_status.config, key='face_status', text="Face Detection: Inactive", fg='#e74c3c')
     
     def face_detection_loop(self):
         """Face detection loop running in background"""
+        # The cascade only runs on parts of the frame that changed
+        motion_gate = MotionGate(self.motion_rois)
         while self.running and self.cap:
             try:
                 ret, frame = self.cap.read()
@@ -203,26 +219,32 @@ class GUIAttendanceSystem:
                     break
                 
                 gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                faces = self.face_cascade.detectMultiScale(gray, 1.1, 4)
+                faces = motion_gate.detect(gray, lambda region: self.face_cascade.detectMultiScale(region, 1.1, 4))
                 
                 if len(faces) > 0:
-                    self.face_status.config(text=f"Face Detection: {len(faces)} face(s) detected", fg='#27ae60')
+                    self.ui.post(self.face_status.config, key='face_status',
+                                 text=f"Face Detection: {len(faces)} face(s) detected", fg='#27ae60')
                 else:
-                    self.face_status.config(text="Face Detection: No faces detected", fg='#f39c12')
-                
-                time.sleep(0.5)  # Update every 500ms
+                    self.ui.post(self.face_status.config, key='face_status',
+                                 text="Face Detection: No faces detected", fg='#f39c12')
                 
             except Exception as e:
                 print(f"Face detection error: {e}")
                 break
     
     def mark_attendance(self, student_id):
-        """Mark attendance for a student"""
+        """Mark attendance for a student; repeats within the dedup window are not written"""
         if student_id in self.attendance_data:
+            last_marked = parse_mark_time(self.attendance_data[student_id]['last_attendance'])
+            if not self.dedup.admit(student_id, last_marked=last_marked):
+                messagebox.showinfo("Already Marked",
+                                    f"{self.attendance_data[student_id]['name']} was already marked "
+                                    f"in the last {self.dedup.window} seconds.")
+                return
+            
             current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            self.attendance_data[student_id]["total_attendance"] += 1
-            self.attendance_data[student_id]["last_attendance"] = current_time
-            self.save_attendance_data()
+            # Only this student's record is written
+            self.attendance_data[student_id] = self.storage.record_tally(student_id, current_time)
             
             student_name = self.attendance_data[student_id]["name"]
             messagebox.showinfo("Attendance Marked", 
@@ -230,7 +252,7 @@ class GUIAttendanceSystem:
                               f"Total attendance: {self.attendance_data[student_id]['total_attendance']}\n"
                               f"Time: {current_time}")
             
-            self.update_display()
+            self.update_display([student_id])
         else:
             messagebox.showerror("Error", f"Student ID {student_id} not found!")
     
@@ -244,8 +266,14 @@ class GUIAttendanceSystem:
         self.running = False
         if self.cap:
             self.cap.release()
+        self.storage.close()
         self.root.destroy()
 
 if __name__ == "__main__":
-    app = GUIAttendanceSystem()
+    parser = argparse.ArgumentParser(description="GUI attendance system")
+    parser.add_argument('--storage', choices=['json', 'sqlite'], default='json', help="storage backend")
+    parser.add_argument('--roi', type=parse_roi, action='append', default=None,
+                        help="only watch this part of the frame for faces, as fractions x,y,w,h (repeatable)")
+    args = parser.parse_args()
+    app = GUIAttendanceSystem(storage_backend=args.storage, motion_rois=args.roi)
     app.run()
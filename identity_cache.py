@@ -0,0 +1,134 @@
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+class IdentityCache:
+    """Short-lived memory of faces already resolved to a student
+
+    Two layers, both expiring `ttl` seconds after the gallery match that
+    produced them (hits do not extend the entry, so every identity is
+    re-checked against the gallery at least once per ttl):
+
+    - by track id: a face the tracker is still following keeps its student
+      id, so neither encoding nor matching runs for it again;
+    - by embedding: a new encoding within `tolerance` of a recently
+      resolved one reuses that result instead of scanning the gallery.
+
+    Only successful matches are cached; unknown faces always go to the
+    gallery so a student seen first at a bad angle is not locked out.
+    """
+
+    def __init__(self, ttl=5.0, tolerance=0.3, max_entries=256, dim=128, clock=time.monotonic):
+        self.ttl = ttl
+        self.tolerance = tolerance
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.tracks = OrderedDict()     # track_id -> (expires_at, student_id), oldest first
+
+        # Ring buffer of recently resolved encodings
+        self.encodings = np.zeros((max_entries, dim), dtype=np.float32)
+        self.sq_norms = np.zeros(max_entries, dtype=np.float32)
+        self.expires_at = np.full(max_entries, -np.inf)
+        self.student_ids = [None] * max_entries
+        self.next_slot = 0
+
+        # Counters
+        self.track_hits = 0
+        self.embedding_hits = 0
+        self.misses = 0
+
+    def _expire_tracks(self, now):
+        while self.tracks:
+            track_id, (expires_at, _) = next(iter(self.tracks.items()))
+            if expires_at > now:
+                break
+            self.tracks.popitem(last=False)
+
+    def lookup_track(self, track_id):
+        """Student id cached for a live track, or None"""
+        with self.lock:
+            self._expire_tracks(self.clock())
+            entry = self.tracks.get(track_id)
+            if entry is None:
+                return None
+            self.track_hits += 1
+            return entry[1]
+
+    def store_track(self, track_id, student_id):
+        if student_id is None:
+            return
+        with self.lock:
+            self.tracks.pop(track_id, None)
+            self.tracks[track_id] = (self.clock() + self.ttl, student_id)
+
+    def forget_track(self, track_id):
+        """Drop a track's cached student, e.g. once the tracker lost it"""
+        with self.lock:
+            self.tracks.pop(track_id, None)
+
+    def lookup(self, encodings):
+        """Cached student id (or None on a miss) for each encoding, one distance matrix for all"""
+        probes = np.atleast_2d(np.asarray(encodings, dtype=np.float32))
+        with self.lock:
+            live = np.flatnonzero(self.expires_at > self.clock())
+            if len(live) == 0:
+                self.misses += len(probes)
+                return [None] * len(probes)
+            cached = self.encodings[live]
+            probe_sq = np.einsum('ij,ij->i', probes, probes)[:, np.newaxis]
+            sq_dist = probe_sq + self.sq_norms[live][np.newaxis, :] - 2.0 * (probes @ cached.T)
+            nearest = sq_dist.argmin(axis=1)
+            close = sq_dist[np.arange(len(probes)), nearest] <= self.tolerance ** 2
+            results = [self.student_ids[live[column]] if hit else None
+                       for column, hit in zip(nearest.tolist(), close.tolist())]
+            hits = int(close.sum())
+            self.embedding_hits += hits
+            self.misses += len(probes) - hits
+            return results
+
+    def store(self, encoding, student_id):
+        if student_id is None:
+            return
+        encoding = np.asarray(encoding, dtype=np.float32).ravel()
+        with self.lock:
+            slot = self.next_slot
+            self.next_slot = (slot + 1) % len(self.encodings)
+            self.encodings[slot] = encoding
+            self.sq_norms[slot] = encoding @ encoding
+            self.expires_at[slot] = self.clock() + self.ttl
+            self.student_ids[slot] = student_id
+
+    def resolve(self, encodings, match_fn):
+        """Student id (or None) per encoding; only cache misses are passed to match_fn
+
+        match_fn takes a list of encodings and returns one student id or
+        None for each, e.g. lambda e: gallery.best_matches(e, 0.6)[0].
+        """
+        if len(encodings) == 0:
+            return []
+        results = self.lookup(encodings)
+        missed = [i for i, student_id in enumerate(results) if student_id is None]
+        if missed:
+            matched = match_fn([encodings[i] for i in missed])
+            for i, student_id in zip(missed, matched):
+                results[i] = student_id
+                self.store(encodings[i], student_id)
+        return results
+
+    def clear(self):
+        with self.lock:
+            self.tracks.clear()
+            self.expires_at[:] = -np.inf
+
+    def stats(self):
+        with self.lock:
+            lookups = self.embedding_hits + self.misses
+            return {
+                'track_hits': self.track_hits,
+                'embedding_hits': self.embedding_hits,
+                'misses': self.misses,
+                'hit_rate': self.embedding_hits / lookups if lookups else 0.0,
+                'live_tracks': len(self.tracks)
+            }
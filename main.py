@@ -1,8 +1,6 @@
 import os
 import cv2
-import pickle
 import cvzone
-import face_recognition
 import numpy as np
 from datetime import datetime
 
@@ -11,6 +9,16 @@ from firebase_admin import credentials
 from firebase_admin import db
 from firebase_admin import storage
 import numpy as np
+from embedding_store import open_store
+from face_gallery import FaceGallery
+from ann_index import open_index
+from frame_grabber import FrameGrabber
+from face_tracker import FaceTracker
+from identity_cache import IdentityCache
+from profile_cache import StudentProfileCache
+from attendance_writer import AttendanceWriteQueue
+from attendance_dedup import AttendanceDeduplicator, parse_mark_time
+from recognition_client import RecognitionClient
 
 # Database setup
 cred = credentials.Certificate("serviceAccountKey.json")
@@ -21,9 +29,8 @@ firebase_admin.initialize_app(cred,{
 
 bucket = storage.bucket()
 
-cap=cv2.VideoCapture(0)
-cap.set(3,640)
-cap.set(4,480)
+# Frames are captured on their own thread, a slow recognition pass only drops stale frames
+cap=FrameGrabber(0,640,480)
 
 # Importing the mode images into a list
 imgBackground=cv2.imread('Resources/background.png')
@@ -54,19 +61,76 @@ for img in imgPathList:
 classNames={k:v for k,v in zip(ids,names)}
 print(classNames)
 
-# Load the encoding file
-print("Loading Encode File...")
-file=open('EncodeFile.p','rb')
-encodeListKnownWithIds=pickle.load(file)
-file.close()
-encodeListKnown, studentIds = encodeListKnownWithIds
-print(studentIds)
-print("Encode File Loaded...")
+# With RECOGNITION_SERVICE set (http://host:port or unix:///path/to/socket) encoding and matching run in the shared service
+serviceUrl=os.environ.get('RECOGNITION_SERVICE')
+recognitionClient=RecognitionClient(serviceUrl) if serviceUrl else None
+if recognitionClient is None:
+    import face_recognition   # dlib is only needed when detection and encoding run in this process
+
+    # Load the encodings (memory-mapped, nothing is copied or unpickled)
+    print("Loading Encode Store...")
+    encodeStore=open_store()
+    studentIds, encodeListKnown = encodeStore.active()
+    print(studentIds)
+    print("Encode Store Loaded...")
+    # Very large galleries are searched through the IVF index saved next to the store instead of a full scan
+    if len(studentIds)>=10000:
+        faceGallery=open_index(nprobe=8)
+    else:
+        faceGallery=FaceGallery(studentIds,encodeListKnown,metric='euclidean')
+else:
+    # The service holds the gallery, the kiosk only needs the roster to warm the profile cache
+    studentIds=recognitionClient.student_ids()
+
+remoteIds={}   # Face location -> student id from the service's last detection pass
+
+def detectFaces(imgS):
+    if recognitionClient is None:
+        return face_recognition.face_locations(imgS)
+    # The service detects and identifies in one round trip, recognizeFaces then reads the ids from here
+    remoteIds.clear()
+    for result in recognitionClient.identify_frame(imgS):
+        remoteIds[tuple(result['location'])]=result['student_id']
+    return list(remoteIds)
+
+def recognizeFaces(imgS,faceLocations):
+    if recognitionClient is not None:
+        missing=[faceLoc for faceLoc in faceLocations if tuple(faceLoc) not in remoteIds]
+        if missing:
+            for result in recognitionClient.identify_frame(imgS,missing):
+                remoteIds[tuple(result['location'])]=result['student_id']
+        return [remoteIds.get(tuple(faceLoc)) for faceLoc in faceLocations]
+    encodeCurrFrame=face_recognition.face_encodings(imgS,faceLocations)  # Finds the encodings of the current detected face
+    if not encodeCurrFrame:
+        return []
+    # Faces close to one resolved in the last few seconds reuse that result, the rest are matched
+    # in one probes x students distance matrix, same 0.6 cut-off as compare_faces
+    recognizedIds=identityCache.resolve(encodeCurrFrame,
+                                        lambda encodes: faceGallery.best_matches(encodes,threshold=0.6)[0])
+    return recognizedIds
+
+# Attendance updates are written behind the video loop, batched and journaled locally until they reach the DB
+# Built first so writes left in the journal by a crash are replayed before any profile is read
+writeQueue=AttendanceWriteQueue(db.reference)
+
+# Student profiles and photos are fetched in the background and cached, starting with as much of the roster as fits
+# Queued writes are laid over fetched profiles, so total_attendance is never incremented from a stale value
+profileCache=StudentProfileCache(db.reference,bucket,pending_fn=writeQueue.pending_fields)
+profileCache.warm(studentIds)
+
+# Repeat sightings of a student within 50 seconds are dropped here, before any write is queued
+attendanceDedup=AttendanceDeduplicator(window=50)
+
+# Full detection + encoding runs every 10th frame (or when a face is lost), boxes are tracked in between
+# Tracks and encodings already resolved to a student are trusted for 5 seconds before matching again
+identityCache=IdentityCache(ttl=5.0,tolerance=0.3)
+tracker=FaceTracker(detectFaces,recognizeFaces,detect_every=10,identity_cache=identityCache)
 
 modeType=0
 counter=0
 id=-1
 imgStudent=[]
+profileLoading=False
 
 while True:
     success,img=cap.read()
@@ -74,26 +138,19 @@ while True:
     imgS=cv2.resize(img,(0,0), None, 0.25, 0.25)   # Scaling down the image to 1/4th as it takes a lot of computaton power
     imgS=cv2.cvtColor(imgS,cv2.COLOR_BGR2RGB)
 
-    faceCurrFrame=face_recognition.face_locations(imgS)    # Detects the current face frame
-    encodeCurrFrame=face_recognition.face_encodings(imgS,faceCurrFrame)  # Finds the encodings of the current detected face
+    faceTracks=tracker.update(imgS)    # Detected or tracked faces in the current frame
 
     imgBackground[162:162+480,55:55+640]=img  # Overlaying the image upon the background template
     imgBackground[44:44+633, 808:808 + 414] = imgModeList[modeType]
 
-    if faceCurrFrame:
-
-        for encodeFace,faceLoc in zip(encodeCurrFrame,faceCurrFrame):
-            matches=face_recognition.compare_faces(encodeListKnown,encodeFace)
-            faceDis=face_recognition.face_distance(encodeListKnown,encodeFace)   # Lower the face distance , better the match
-            print("Matches:",matches)
-            print("Face Distance:",faceDis)
+    if faceTracks:
 
-            matchIndex=np.argmin(faceDis)   # Returns the index with the min face distance as that will be the match
-            # print("Match Index",matchIndex)
+        for track in faceTracks:
+            faceLoc=track.box
 
-            if matches[matchIndex]:
+            if track.student_id is not None:
                 # print("Known Face Detected!")
-                id = studentIds[matchIndex]  # Retrieving ID of student whose face is detected
+                id = track.student_id  # Retrieving ID of student whose face is detected
 
                 name=classNames[id].upper()
 
@@ -117,25 +174,31 @@ while True:
 
             # Only in the first frame the download of student data happens
             if counter==1:
-                studentInfo = db.reference(f'Students/{id}').get()    # Extracting the data of student corresponding to the ID that is detected from the DB
-                print(studentInfo)
+                # Data and image of the detected student come from the cache, the lookup never blocks
+                profile=profileCache.get(id)
+                profileLoading = profile is None    # Still downloading: stay in Loading mode and retry next frame
+                if profileLoading and profileCache.unavailable(id):
+                    # No profile for this student, or the fetch failed: back to Active instead of waiting
+                    counter=0
+                    modeType=0
+                    profileLoading=False
+                    imgBackground[44:44 + 633, 808:808 + 414] = imgModeList[modeType]
 
-                # Getting the image from the storage
-                blob = bucket.blob(f'Images/{id}.jpg')
-                array = np.frombuffer(blob.download_as_string(),np.uint8)
-                imgStudent=cv2.imdecode(array,cv2.COLOR_BGRA2BGR)
+            if counter==1 and not profileLoading:
+                studentInfo,imgStudent=profile
+                studentInfo=dict(studentInfo)    # Local copy, the cache is updated explicitly below
+                print(studentInfo)
 
-                # Updating data of attendance
-                dateTimeObject = datetime.strptime(studentInfo['last_attendance_time'],
-                                                  "%Y-%m-%d %H:%M:%S")
-                secondsElapsed=(datetime.now()-dateTimeObject).total_seconds()
-                print(secondsElapsed)
+                # Updating data of attendance, unless the student was marked within the dedup window
+                lastMarked=parse_mark_time(studentInfo['last_attendance_time'])
 
-                if secondsElapsed > 50:
-                    ref=db.reference(f'Students/{id}')
+                if attendanceDedup.admit(id,last_marked=lastMarked):
                     studentInfo['total_attendance']+=1
-                    ref.child('total_attendance').set(studentInfo['total_attendance'])
-                    ref.child('last_attendance_time').set(datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+                    studentInfo['last_attendance_time']=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    writeQueue.enqueue(id,total_attendance=studentInfo['total_attendance'],
+                                       last_attendance_time=studentInfo['last_attendance_time'])
+                    profileCache.update(id,total_attendance=studentInfo['total_attendance'],
+                                        last_attendance_time=studentInfo['last_attendance_time'])
 
 
                 # Already marked case
@@ -145,7 +208,7 @@ while True:
                     imgBackground[44:44 + 633, 808:808 + 414] = imgModeList[modeType]
 
             # If already not marked, then perform the update
-            if modeType !=3:
+            if modeType !=3 and not profileLoading:
                 # ModeType becomes 2 when no. of frames are between 30 and 40
                 if 20<counter<40:
                     modeType = 2
@@ -201,5 +264,11 @@ while True:
     if cv2.waitKey(1) & 0xFF == ord('q'):
         break
 
+print("Capture stats:",cap.stats())
+print("Identity cache stats:",identityCache.stats())
+profileCache.close()
+writeQueue.close()
+if recognitionClient is not None:
+    recognitionClient.close()
 cap.release()
 cv2.destroyAllWindows()
\ No newline at end of file
@@ -0,0 +1,157 @@
+import cv2
+import numpy as np
+
+
+def parse_roi(text):
+    """'x,y,w,h' as fractions of the frame (e.g. '0.25,0,0.5,1') -> tuple of floats"""
+    values = tuple(float(v) for v in text.split(','))
+    if len(values) != 4 or not all(0.0 <= v <= 1.0 for v in values):
+        raise ValueError(f"ROI must be four fractions x,y,w,h between 0 and 1, got {text!r}")
+    return values
+
+
+def _overlaps(a, b):
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def _merge_boxes(boxes):
+    """Merge overlapping (x1, y1, x2, y2) boxes until none overlap"""
+    boxes = list(boxes)
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(boxes)):
+            for j in range(i + 1, len(boxes)):
+                a, b = boxes[i], boxes[j]
+                if _overlaps(a, b):
+                    boxes[i] = (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+                    boxes.pop(j)
+                    merged = True
+                    break
+            if merged:
+                break
+    return boxes
+
+
+class MotionGate:
+    """Runs a face detector only on the parts of a frame that changed
+
+    Each frame is shrunk by `scale`, blurred and differenced against the
+    previous one; changed pixels inside the ROIs are grouped into padded
+    regions and detect_fn runs on those crops only. Regions where faces
+    were found last time are searched again for `hold_frames` frames, so
+    a student standing still at the door is not lost. An empty, static
+    room costs one tiny absdiff per frame and no detection at all.
+
+    rois are (x, y, w, h) fractions of the frame; None watches everything.
+    detect_fn(gray) returns (x, y, w, h) boxes like detectMultiScale.
+    """
+
+    def __init__(self, rois=None, scale=0.125, threshold=25, min_area=4, pad=0.5,
+                 hold_frames=15, full_frame_ratio=0.6):
+        self.rois = list(rois) if rois else None
+        self.scale = scale
+        self.threshold = threshold
+        self.min_area = min_area                # Changed pixels (downscaled) for a region to count
+        self.pad = pad                          # Region growth, as a fraction of its size
+        self.hold_frames = hold_frames
+        self.full_frame_ratio = full_frame_ratio  # Above this share of the frame, one full pass is cheaper
+        self.previous = None
+        self.roi_mask = None
+        self.held = []      # [(x1, y1, x2, y2), frames left] around recent faces
+
+        # Counters
+        self.frames = 0
+        self.frames_detected = 0
+        self.pixels_scanned = 0
+        self.pixels_total = 0
+
+    def _build_roi_mask(self, shape):
+        height, width = shape
+        if self.rois is None:
+            return None
+        mask = np.zeros(shape, dtype=np.uint8)
+        for x, y, w, h in self.rois:
+            mask[int(y * height):int(np.ceil((y + h) * height)), int(x * width):int(np.ceil((x + w) * width))] = 255
+        return mask
+
+    def _roi_boxes(self, width, height):
+        if self.rois is None:
+            return [(0, 0, width, height)]
+        return [(int(x * width), int(y * height), int(np.ceil((x + w) * width)), int(np.ceil((y + h) * height)))
+                for x, y, w, h in self.rois]
+
+    def regions(self, gray):
+        """Padded (x1, y1, x2, y2) regions of the full frame worth running detection on"""
+        height, width = gray.shape[:2]
+        small = cv2.resize(gray, (max(1, int(width * self.scale)), max(1, int(height * self.scale))),
+                           interpolation=cv2.INTER_AREA)
+        small = cv2.GaussianBlur(small, (5, 5), 0)
+
+        if self.previous is None or self.previous.shape != small.shape:
+            # First frame: nothing to compare against, look at every ROI
+            self.previous = small
+            self.roi_mask = self._build_roi_mask(small.shape)
+            return self._roi_boxes(width, height)
+
+        changed = cv2.absdiff(small, self.previous) > self.threshold
+        self.previous = small
+        changed = changed.astype(np.uint8) * 255
+        if self.roi_mask is not None:
+            changed = cv2.bitwise_and(changed, self.roi_mask)
+        changed = cv2.dilate(changed, None, iterations=2)
+
+        boxes = []
+        count, _, components, _ = cv2.connectedComponentsWithStats(changed)
+        for x, y, w, h, area in components[1:count]:
+            if area < self.min_area:
+                continue
+            # Back to full-frame pixels, grown so a moving shoulder still yields the whole face
+            pad_x, pad_y = w * self.pad, h * self.pad
+            boxes.append((max(0, int((x - pad_x) / self.scale)), max(0, int((y - pad_y) / self.scale)),
+                          min(width, int((x + w + pad_x) / self.scale)), min(height, int((y + h + pad_y) / self.scale))))
+
+        boxes.extend(box for box, _ in self.held)
+        return _merge_boxes(boxes)
+
+    def detect(self, gray, detect_fn):
+        """Run detect_fn on the changed regions only; returns (x, y, w, h) boxes in frame coordinates"""
+        height, width = gray.shape[:2]
+        self.frames += 1
+        self.pixels_total += width * height
+        regions = self.regions(gray)
+
+        self.held = [(box, left - 1) for box, left in self.held if left > 1]
+        if not regions:
+            return []
+
+        area = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in regions)
+        if area > self.full_frame_ratio * width * height:
+            regions = self._roi_boxes(width, height) if self.rois else [(0, 0, width, height)]
+            area = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in regions)
+
+        self.frames_detected += 1
+        self.pixels_scanned += area
+        faces = []
+        for x1, y1, x2, y2 in regions:
+            for x, y, w, h in detect_fn(gray[y1:y2, x1:x2]):
+                faces.append((x + x1, y + y1, w, h))
+
+        # Keep searching around each face for a while even if it stops moving
+        found = [(max(0, x - w // 2), max(0, y - h // 2), min(width, x + w + w // 2), min(height, y + h + h // 2))
+                 for x, y, w, h in faces]
+        self.held = [(box, self.hold_frames) for box in found] + [
+            (box, left) for box, left in self.held if not any(_overlaps(box, face) for face in found)]
+        return faces
+
+    def reset(self):
+        self.previous = None
+        self.held = []
+
+    def stats(self):
+        return {
+            'frames': self.frames,
+            'frames_detected': self.frames_detected,
+            'detect_ratio': self.frames_detected / self.frames if self.frames else 0.0,
+            'area_scanned': self.pixels_scanned / self.pixels_total if self.pixels_total else 0.0
+        }
@@ -0,0 +1,185 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from frame_grabber import FrameGrabber
+
+
+def parse_source(source):
+    """Camera index ('0' -> 0), video file path or stream URL (rtsp://...)"""
+    if isinstance(source, str) and source.strip().isdigit():
+        return int(source)
+    return source
+
+
+def is_live_source(source):
+    """Cameras and network streams run in real time; anything else is a recorded file"""
+    return isinstance(source, int) or '://' in str(source)
+
+
+class MultiCameraManager:
+    """Feeds frames from several capture sources into one shared worker pool
+
+    Each source gets its own FrameGrabber. A dispatcher thread visits the
+    sources round-robin and submits process_fn(source_label, frame) to the
+    pool, with at most one frame in flight per source and at most `workers`
+    overall. A busy source therefore never gets ahead of the others, and
+    while it waits its grabber keeps only the newest frame (live cameras)
+    or holds the file at the next frame (recorded video); drop_frames=None
+    picks between the two per source. Whatever process_fn returns is passed
+    to on_result(source_label, result) on the worker thread.
+    """
+
+    def __init__(self, sources, process_fn, on_result=None, workers=None, drop_frames=None,
+                 width=None, height=None, poll_interval=0.01):
+        self.process_fn = process_fn
+        self.on_result = on_result
+        self.poll_interval = poll_interval
+
+        self.grabbers = {}      # source label -> FrameGrabber, in the order given
+        self.failed = []        # Labels of sources that could not be opened
+        for source in sources:
+            source = parse_source(source)
+            label = str(source)
+            if label in self.grabbers or label in self.failed:
+                # A second reader on the same device would only fight the first one for frames
+                print(f"Ignoring duplicate source: {label}")
+                continue
+            drop = is_live_source(source) if drop_frames is None else drop_frames
+            grabber = FrameGrabber(source, width, height, drop_frames=drop)
+            if grabber.isOpened():
+                self.grabbers[label] = grabber
+            else:
+                grabber.release()
+                self.failed.append(label)
+
+        self.workers = workers or max(2, len(self.grabbers))
+        self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='recognition')
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.finished = threading.Event()
+        self.in_flight = set()
+        self.ended = set()
+        self.next_index = 0
+        self.running = True
+
+        # Per-source counters
+        self.processed = {label: 0 for label in self.grabbers}
+        self.errors = {label: 0 for label in self.grabbers}
+        self.busy_time = {label: 0.0 for label in self.grabbers}
+
+        self.thread = threading.Thread(target=self._dispatch, daemon=True)
+        self.thread.start()
+
+    def _dispatch(self):
+        labels = list(self.grabbers)
+        while self.running:
+            submitted = False
+            for offset in range(len(labels)):
+                index = (self.next_index + offset) % len(labels)
+                label = labels[index]
+                with self.lock:
+                    if label in self.in_flight or label in self.ended:
+                        continue
+                    if len(self.in_flight) >= self.workers:
+                        break
+                grabber = self.grabbers[label]
+                ok, frame = grabber.read(timeout=0)
+                if not ok:
+                    if not grabber.isOpened():
+                        with self.lock:
+                            self.ended.add(label)
+                    continue
+                with self.lock:
+                    self.in_flight.add(label)
+                self.pool.submit(self._process, label, frame)
+                # The next round starts after the source that was just served
+                self.next_index = index + 1
+                submitted = True
+
+            with self.lock:
+                if len(self.ended) == len(labels) and not self.in_flight:
+                    break
+            if not submitted:
+                self.wakeup.wait(self.poll_interval)
+                self.wakeup.clear()
+        self.finished.set()
+
+    def _process(self, label, frame):
+        started = time.time()
+        try:
+            result = self.process_fn(label, frame)
+            if self.on_result is not None:
+                self.on_result(label, result)
+        except Exception as e:
+            print(f"Recognition error on {label}: {e}")
+            with self.lock:
+                self.errors[label] += 1
+        finally:
+            with self.lock:
+                self.processed[label] += 1
+                self.busy_time[label] += time.time() - started
+                self.in_flight.discard(label)
+            self.wakeup.set()
+
+    def first_grabber(self):
+        return next(iter(self.grabbers.values()), None)
+
+    def wait(self, timeout=None):
+        """Block until every source has ended (video files) or timeout; True if all ended"""
+        return self.finished.wait(timeout)
+
+    def stats(self):
+        """Per-source processed frames, errors, processing time and grabber counters"""
+        with self.lock:
+            per_source = {label: {
+                'processed': self.processed[label],
+                'errors': self.errors[label],
+                'avg_process_ms': (self.busy_time[label] / self.processed[label] * 1000
+                                   if self.processed[label] else 0.0),
+                'ended': label in self.ended
+            } for label in self.grabbers}
+        for label, grabber in self.grabbers.items():
+            per_source[label].update(grabber.stats())
+        return per_source
+
+    def close(self):
+        """Stop dispatching, let in-flight frames finish and release every source"""
+        self.running = False
+        self.wakeup.set()
+        self.thread.join(timeout=2.0)
+        self.pool.shutdown(wait=True)
+        for grabber in self.grabbers.values():
+            grabber.release()
+
+
+if __name__ == "__main__":
+    import argparse
+    import cv2
+
+    parser = argparse.ArgumentParser(description="Run face detection over several cameras or video files")
+    parser.add_argument('sources', nargs='+', help="Camera indices, video files or stream URLs")
+    parser.add_argument('--workers', type=int, default=None, help="Detection worker threads")
+    args = parser.parse_args()
+
+    local = threading.local()
+
+    def count_faces(label, frame):
+        # One cascade per worker thread
+        if not hasattr(local, 'cascade'):
+            local.cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return len(local.cascade.detectMultiScale(gray, 1.1, 4))
+
+    # Files are read frame by frame; live cameras keep only their newest frame
+    manager = MultiCameraManager(args.sources, count_faces, workers=args.workers)
+    if manager.failed:
+        print(f"Could not open: {', '.join(manager.failed)}")
+    try:
+        while not manager.wait(1.0):
+            print({label: stats['processed'] for label, stats in manager.stats().items()})
+    except KeyboardInterrupt:
+        pass
+    manager.close()
+    for label, stats in manager.stats().items():
+        print(f"{label}: {stats['processed']} frames, {stats['errors']} errors, "
+              f"{stats['avg_process_ms']:.1f} ms/frame, {stats['dropped']} dropped")
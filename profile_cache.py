@@ -0,0 +1,174 @@
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+
+
+class StudentProfileCache:
+    """LRU cache of student profiles and photos, filled by background fetches
+
+    get() never blocks: it returns (studentInfo, imgStudent) when a fresh
+    entry is cached and otherwise schedules a fetch and returns None, so the
+    render loop can keep drawing while the download happens. A failed fetch
+    is retried with per-student backoff and a student with no profile is
+    remembered for missing_ttl seconds; unavailable() tells the caller to
+    stop waiting in either case.
+
+    The database and storage clients are injected, so anything with the
+    shape of firebase_admin works: reference_fn(path).get() must return the
+    profile dict and bucket.blob(path).download_as_string() the photo bytes.
+
+    pending_fn(student_id), if given, returns local writes that may not have
+    reached the database yet (AttendanceWriteQueue.pending_fields); they are
+    laid over every fetched profile so a replayed write is never read back
+    stale.
+    """
+
+    def __init__(self, reference_fn, bucket, max_entries=512, ttl=300, workers=4,
+                 profile_path='Students/{}', image_path='Images/{}.jpg', pending_fn=None,
+                 retry_delay=2.0, max_retry_delay=60.0, missing_ttl=30.0):
+        self.reference_fn = reference_fn
+        self.bucket = bucket
+        self.pending_fn = pending_fn
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.missing_ttl = missing_ttl
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.profile_path = profile_path
+        self.image_path = image_path
+
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()    # student_id -> (fetched_at, studentInfo, imgStudent)
+        self.pending = {}               # student_id -> Future of an in-flight fetch
+        self.failed = {}                # student_id -> (retry_at, failed attempts) after an error or missing profile
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='profile-fetch')
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _fetch(self, student_id):
+        # Taken before the read too: a write flushed while the read is in flight leaves the queue
+        # but may be missing from what the read returns
+        queued = self.pending_fn(student_id) if self.pending_fn else {}
+        try:
+            studentInfo = self.reference_fn(self.profile_path.format(student_id)).get()
+            blob = self.bucket.blob(self.image_path.format(student_id))
+            array = np.frombuffer(blob.download_as_string(), np.uint8)
+            imgStudent = cv2.imdecode(array, cv2.IMREAD_COLOR)
+        except Exception as e:
+            print(f"Profile fetch failed for {student_id}: {e}")
+            with self.lock:
+                self.errors += 1
+                self.pending.pop(student_id, None)
+                # Doubling delay per student, so an outage is not hammered every frame
+                _, attempts = self.failed.get(student_id, (0.0, 0))
+                delay = min(self.retry_delay * 2 ** attempts, self.max_retry_delay)
+                self.failed[student_id] = (time.time() + delay, attempts + 1)
+            return None
+
+        if studentInfo is not None and self.pending_fn:
+            queued.update(self.pending_fn(student_id))
+            studentInfo = dict(studentInfo, **queued)
+
+        with self.lock:
+            self.pending.pop(student_id, None)
+            if studentInfo is None:
+                # No such student in the database: remembered rather than fetched again every frame
+                self.failed[student_id] = (time.time() + self.missing_ttl, 0)
+                return None
+            self.failed.pop(student_id, None)
+            self.entries[student_id] = (time.time(), studentInfo, imgStudent)
+            self.entries.move_to_end(student_id)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return studentInfo, imgStudent
+
+    def _lookup(self, student_id):
+        # Caller holds the lock; expired entries are dropped here
+        entry = self.entries.get(student_id)
+        if entry is None:
+            return None
+        fetched_at, studentInfo, imgStudent = entry
+        if time.time() - fetched_at > self.ttl:
+            del self.entries[student_id]
+            return None
+        self.entries.move_to_end(student_id)
+        return studentInfo, imgStudent
+
+    def _backing_off(self, student_id):
+        # Caller holds the lock
+        failure = self.failed.get(student_id)
+        return failure is not None and failure[0] > time.time()
+
+    def unavailable(self, student_id):
+        """True while the last fetch failed or found no profile and no retry is due yet"""
+        with self.lock:
+            return student_id not in self.pending and self._backing_off(student_id)
+
+    def prefetch(self, student_id):
+        """Start a background fetch unless the entry is fresh or already on its way"""
+        with self.lock:
+            if self._lookup(student_id) is not None or self._backing_off(student_id):
+                return None
+            future = self.pending.get(student_id)
+            if future is None:
+                future = self.executor.submit(self._fetch, student_id)
+                self.pending[student_id] = future
+            return future
+
+    def get(self, student_id):
+        """Return (studentInfo, imgStudent) if cached, otherwise fetch in the background and return None"""
+        with self.lock:
+            cached = self._lookup(student_id)
+            if cached is not None:
+                self.hits += 1
+                return cached
+            self.misses += 1
+        self.prefetch(student_id)
+        return None
+
+    def wait(self, student_id, timeout=None):
+        """Blocking variant of get() for scripts and tests"""
+        cached = self.get(student_id)
+        if cached is not None:
+            return cached
+        with self.lock:
+            future = self.pending.get(student_id)
+        if future is not None:
+            future.result(timeout)
+        with self.lock:
+            return self._lookup(student_id)
+
+    def warm(self, student_ids):
+        """Prefetch the roster, typically once at startup
+
+        Only the first max_entries students are fetched; on a larger roster
+        the rest would just evict them again before anyone is seen.
+        """
+        for student_id in list(student_ids)[:self.max_entries]:
+            self.prefetch(student_id)
+
+    def update(self, student_id, **fields):
+        """Apply a local write to the cached profile so it stays in sync with the database"""
+        with self.lock:
+            entry = self.entries.get(student_id)
+            if entry is not None:
+                entry[1].update(fields)
+
+    def invalidate(self, student_id=None):
+        """Forget one student, or everything when no id is given"""
+        with self.lock:
+            if student_id is None:
+                self.entries.clear()
+                self.failed.clear()
+            else:
+                self.entries.pop(student_id, None)
+                self.failed.pop(student_id, None)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
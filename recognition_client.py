@@ -0,0 +1,95 @@
+import json
+import base64
+import socket
+import http.client
+from urllib.parse import urlparse
+import cv2
+import numpy as np
+
+DEFAULT_PORT = 8765
+
+
+def encode_image(rgb):
+    """PNG-encode an RGB frame for the JSON API (lossless, so encodings match local ones)"""
+    ok, buffer = cv2.imencode('.png', cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR))
+    if not ok:
+        raise ValueError("Could not encode frame")
+    return base64.b64encode(buffer.tobytes()).decode('ascii')
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+
+    def __init__(self, path, timeout):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class RecognitionClient:
+    """Thin client for the recognition service
+
+    url is http://host:port or unix:///path/to/socket. The connection is
+    kept open between calls; one client should be used from one thread.
+    """
+
+    def __init__(self, url=f"http://127.0.0.1:{DEFAULT_PORT}", timeout=10.0):
+        self.url = url
+        self.timeout = timeout
+        self.connection = None
+
+    def _connect(self):
+        parsed = urlparse(self.url)
+        if parsed.scheme == 'unix':
+            return _UnixHTTPConnection(parsed.path, self.timeout)
+        return http.client.HTTPConnection(parsed.hostname, parsed.port or DEFAULT_PORT, timeout=self.timeout)
+
+    def _request(self, method, path, payload=None):
+        body = json.dumps(payload).encode('utf-8') if payload is not None else None
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = self._connect()
+            try:
+                self.connection.request(method, path, body, headers)
+                response = self.connection.getresponse()
+                data = json.loads(response.read() or b'{}')
+                break
+            except (ConnectionError, http.client.HTTPException):
+                # The kept-alive connection was dropped; reconnect once
+                self.close()
+                if attempt:
+                    raise
+        if response.status != 200:
+            raise RuntimeError(f"Recognition service error {response.status}: {data.get('error')}")
+        return data
+
+    def identify(self, encodings):
+        """List of {'student_id', 'distance'} for each encoding"""
+        encodings = [np.asarray(e, dtype=float).tolist() for e in encodings]
+        return self._request('POST', '/identify', {'encodings': encodings})['results']
+
+    def identify_frame(self, rgb, locations=None):
+        """List of {'student_id', 'distance', 'location'} for each face in an RGB frame"""
+        payload = {'image': encode_image(rgb)}
+        if locations is not None:
+            payload['locations'] = [list(map(int, location)) for location in locations]
+        return self._request('POST', '/identify_frame', payload)['results']
+
+    def student_ids(self):
+        """Ids of every student the service can recognize"""
+        return self._request('GET', '/students')['students']
+
+    def reload(self):
+        return self._request('POST', '/reload', {})['students']
+
+    def health(self):
+        return self._request('GET', '/health')
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
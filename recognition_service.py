@@ -0,0 +1,333 @@
+import os
+import json
+import time
+import base64
+import argparse
+import threading
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import cv2
+import numpy as np
+import face_recognition
+from embedding_store import STORE_DIR, ENCODING_DIM, open_store
+from face_gallery import FaceGallery
+from ann_index import open_index
+from recognition_client import DEFAULT_PORT
+
+TOLERANCE = 0.6     # Same cut-off as face_recognition.compare_faces
+
+
+class _BatchRequest:
+    """Probes from one API call waiting for the batcher"""
+
+    def __init__(self, probes):
+        self.probes = probes
+        self.results = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class MicroBatcher:
+    """Merges concurrent identify requests into one gallery distance computation
+
+    The batcher thread takes the first waiting request, then keeps
+    collecting for up to max_wait_ms or until max_batch probes are queued,
+    and scores all of them against the gallery with a single matrix
+    product. Each caller gets back only the rows for its own probes.
+    """
+
+    def __init__(self, gallery, tolerance=TOLERANCE, max_batch=256, max_wait_ms=5, dim=ENCODING_DIM):
+        self.gallery = gallery
+        self.dim = dim
+        self.tolerance = tolerance
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.condition = threading.Condition()
+        self.pending = []
+        self.running = True
+
+        # Counters
+        self.requests = 0
+        self.batches = 0
+        self.probes = 0
+        self.busy_time = 0.0
+
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def set_gallery(self, gallery):
+        """Swap in a reloaded gallery; batches already running finish on the old one"""
+        with self.condition:
+            self.gallery = gallery
+
+    def identify(self, probes, timeout=10.0):
+        """Return (student_id or None, distance) for each probe encoding"""
+        probes = np.asarray(probes, dtype=np.float32)
+        if probes.size == 0:
+            return []
+        probes = np.atleast_2d(probes)
+        # Checked here so a malformed request fails on its own instead of failing the whole batch
+        if probes.ndim != 2 or probes.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-d encodings, got shape {probes.shape}")
+        request = _BatchRequest(probes)
+        with self.condition:
+            if not self.running:
+                raise RuntimeError("Recognition service is shutting down")
+            self.pending.append(request)
+            self.condition.notify()
+        if not request.done.wait(timeout):
+            raise TimeoutError("Recognition batch timed out")
+        if request.error is not None:
+            raise request.error
+        return request.results
+
+    def _collect(self):
+        with self.condition:
+            self.condition.wait_for(lambda: self.pending or not self.running)
+            if not self.pending:
+                return None, None
+            # Give concurrent callers a moment to join the batch
+            deadline = time.monotonic() + self.max_wait
+            while self.running and sum(len(r.probes) for r in self.pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+            batch, self.pending = self.pending, []
+            return batch, self.gallery
+
+    def _run(self):
+        while True:
+            batch, gallery = self._collect()
+            if batch is None:
+                break
+            started = time.perf_counter()
+            try:
+                probes = np.vstack([request.probes for request in batch])
+                ids, distances = gallery.best_matches(probes, self.tolerance)
+                start = 0
+                for request in batch:
+                    end = start + len(request.probes)
+                    request.results = list(zip(ids[start:end], distances[start:end].tolist()))
+                    start = end
+            except Exception:
+                # Score the requests one by one so only the one that fails gets the error
+                for request in batch:
+                    try:
+                        ids, distances = gallery.best_matches(request.probes, self.tolerance)
+                        request.results = list(zip(ids, distances.tolist()))
+                    except Exception as e:
+                        request.error = e
+            self.busy_time += time.perf_counter() - started
+            self.requests += len(batch)
+            self.batches += 1
+            self.probes += sum(len(request.probes) for request in batch)
+            for request in batch:
+                request.done.set()
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'batches': self.batches,
+            'probes': self.probes,
+            'avg_batch_probes': self.probes / self.batches if self.batches else 0.0,
+            'avg_batch_ms': self.busy_time / self.batches * 1000 if self.batches else 0.0
+        }
+
+    def close(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        self.thread.join(timeout=2.0)
+
+
+class RecognitionService:
+    """Loads the embedding store once and answers identify requests
+
+    identify() matches precomputed 128-d encodings; identify_frame() runs
+    face detection and encoding on an RGB frame first. Both go through the
+    same MicroBatcher, so requests from several rooms share one warm
+    process and one distance computation per batch.
+    """
+
+    def __init__(self, store_path=STORE_DIR, tolerance=TOLERANCE, max_batch=256, max_wait_ms=5, ann_nprobe=None):
+        self.store_path = store_path
+        self.ann_nprobe = ann_nprobe    # Match through the IVF index instead of the exact scan
+        self.started = time.time()
+        self.dim = open_store(store_path).dim
+        self.batcher = MicroBatcher(self._load_gallery(), tolerance, max_batch, max_wait_ms, self.dim)
+        self.counter_lock = threading.Lock()    # Handler threads update the counters concurrently
+        self.frames = 0
+        self.faces = 0
+
+    def _load_gallery(self):
+        if self.ann_nprobe:
+            return open_index(self.store_path, nprobe=self.ann_nprobe)
+        ids, matrix = open_store(self.store_path).active()
+        return FaceGallery(ids, np.array(matrix), metric='euclidean')
+
+    def reload(self):
+        """Re-read the embedding store after students were enrolled or removed"""
+        gallery = self._load_gallery()
+        self.batcher.set_gallery(gallery)
+        return len(gallery)
+
+    def student_ids(self):
+        """Ids of the students in the loaded gallery"""
+        return list(self.batcher.gallery.ids)
+
+    def identify(self, encodings):
+        return [{'student_id': student_id, 'distance': distance}
+                for student_id, distance in self.batcher.identify(encodings)]
+
+    def identify_frame(self, rgb, locations=None):
+        """Detect (unless locations are given), encode and identify every face in an RGB frame"""
+        if locations is None:
+            locations = face_recognition.face_locations(rgb)
+        locations = [tuple(int(v) for v in location) for location in locations]
+        with self.counter_lock:
+            self.frames += 1
+            self.faces += len(locations)
+        if not locations:
+            return []
+        encodings = face_recognition.face_encodings(rgb, locations)
+        results = self.identify(encodings)
+        for location, result in zip(locations, results):
+            result['location'] = list(location)
+        return results
+
+    def stats(self):
+        stats = self.batcher.stats()
+        with self.counter_lock:
+            frames, faces = self.frames, self.faces
+        stats.update({
+            'students': len(self.batcher.gallery),
+            'frames': frames,
+            'faces': faces,
+            'uptime_s': time.time() - self.started
+        })
+        return stats
+
+    def close(self):
+        self.batcher.close()
+
+
+def decode_image(data):
+    buffer = np.frombuffer(base64.b64decode(data), dtype=np.uint8)
+    img = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError("Could not decode image")
+    return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+
+class RecognitionHandler(BaseHTTPRequestHandler):
+    """JSON API
+
+    GET  /health          service counters
+    GET  /students        ids of the enrolled students
+    POST /identify        {"encodings": [[128 floats], ...]}
+    POST /identify_frame  {"image": base64 PNG/JPEG, "locations": optional [[top, right, bottom, left], ...]}
+    POST /reload          re-read the embedding store
+    """
+
+    service = None      # Set on the subclass built by make_server
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send(200, self.service.stats())
+        elif self.path == '/students':
+            self._send(200, {'students': self.service.student_ids()})
+        else:
+            self._send(404, {'error': f"Unknown endpoint {self.path}"})
+
+    def do_POST(self):
+        try:
+            request = self._read_json()
+            if self.path == '/identify':
+                self._send(200, {'results': self.service.identify(request.get('encodings', []))})
+            elif self.path == '/identify_frame':
+                rgb = decode_image(request['image'])
+                self._send(200, {'results': self.service.identify_frame(rgb, request.get('locations'))})
+            elif self.path == '/reload':
+                self._send(200, {'students': self.service.reload()})
+            else:
+                self._send(404, {'error': f"Unknown endpoint {self.path}"})
+        except (ValueError, KeyError) as e:
+            self._send(400, {'error': str(e)})
+        except Exception as e:
+            self._send(500, {'error': str(e)})
+
+    def address_string(self):
+        # Unix socket peers have no (host, port) address
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        pass    # One line per frame would flood the console
+
+
+class RecognitionHTTPServer(ThreadingHTTPServer):
+    request_queue_size = 128    # Many kiosks may connect at once
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def server_bind(self):
+        socketserver.UnixStreamServer.server_bind(self)
+        self.server_name = 'localhost'
+        self.server_port = 0
+
+
+def make_server(service, host='127.0.0.1', port=DEFAULT_PORT, unix_socket=None):
+    """HTTP server on host:port, or on a Unix socket path when one is given"""
+    handler = type('BoundRecognitionHandler', (RecognitionHandler,), {'service': service})
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        return ThreadingUnixHTTPServer(unix_socket, handler)
+    return RecognitionHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless face recognition service")
+    parser.add_argument('--host', default='127.0.0.1', help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument('--unix-socket', default=None, help="listen on this Unix socket path instead of TCP")
+    parser.add_argument('--store', default=STORE_DIR, help="embedding store directory")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help="maximum match distance")
+    parser.add_argument('--max-batch', type=int, default=256, help="most probes scored in one batch")
+    parser.add_argument('--max-wait-ms', type=float, default=5, help="how long a batch waits for more requests")
+    parser.add_argument('--ann-nprobe', type=int, default=None,
+                        help="match through the approximate IVF index, scanning this many cells per face")
+    args = parser.parse_args()
+
+    service = RecognitionService(args.store, args.tolerance, args.max_batch, args.max_wait_ms, args.ann_nprobe)
+    server = make_server(service, args.host, args.port, args.unix_socket)
+    where = args.unix_socket or f"http://{args.host}:{args.port}"
+    print(f"Recognition service with {len(service.batcher.gallery)} students listening on {where}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+    service.close()
+    if args.unix_socket and os.path.exists(args.unix_socket):
+        os.remove(args.unix_socket)
+    print("Service stats:", service.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -2,19 +2,25 @@ import cv2
 import numpy as np
 import os
 from datetime import datetime
-import json
+import argparse
+from frame_grabber import FrameGrabber
+from motion_gate import MotionGate, parse_roi
+from attendance_storage import open_storage
+from attendance_dedup import AttendanceDeduplicator, parse_mark_time
 
 class SimpleAttendanceSystem:
-    def __init__(self):
+    def __init__(self, storage_backend='json', motion_rois=None):
+        self.storage = open_storage(storage_backend)
+        self.motion_rois = motion_rois
         self.attendance_data = {}
         self.load_attendance_data()
+        # Repeat marks within the dedup window never reach storage
+        self.dedup = AttendanceDeduplicator()
         
     def load_attendance_data(self):
-        """Load attendance data from JSON file"""
-        try:
-            with open('attendance_data.json', 'r') as f:
-                self.attendance_data = json.load(f)
-        except FileNotFoundError:
+        """Load attendance data from storage"""
+        self.attendance_data = self.storage.load_tallies()
+        if not self.attendance_data:
             # Initialize with sample data
             self.attendance_data = {
                 "1": {"name": "Soumyadeep Mukherjee", "total_attendance": 0, "last_attendance": ""},
@@ -26,26 +32,25 @@ class SimpleAttendanceSystem:
             self.save_attendance_data()
     
     def save_attendance_data(self):
-        """Save attendance data to JSON file"""
-        with open('attendance_data.json', 'w') as f:
-            json.dump(self.attendance_data, f, indent=2)
+        """Save attendance data to storage"""
+        self.storage.save_tallies(self.attendance_data)
     
     def mark_attendance(self, student_id):
-        """Mark attendance for a student"""
+        """Mark attendance for a student; False if unknown or already marked within the dedup window"""
         if student_id in self.attendance_data:
+            last_marked = parse_mark_time(self.attendance_data[student_id]['last_attendance'])
+            if not self.dedup.admit(student_id, last_marked=last_marked):
+                return False
             current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            self.attendance_data[student_id]["total_attendance"] += 1
-            self.attendance_data[student_id]["last_attendance"] = current_time
-            self.save_attendance_data()
+            # Only this student's record is written
+            self.attendance_data[student_id] = self.storage.record_tally(student_id, current_time)
             return True
         return False
     
     def run(self):
         """Main application loop"""
         # Initialize webcam
-        cap = cv2.VideoCapture(0)
-        cap.set(3, 640)
-        cap.set(4, 480)
+        cap = FrameGrabber(0, 640, 480)
         
         # Load background image
         try:
@@ -58,6 +63,8 @@ class SimpleAttendanceSystem:
         
         # Initialize face cascade
         face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        # The cascade only runs on parts of the frame that changed
+        motion_gate = MotionGate(self.motion_rois)
         
         print("Simple Attendance System Started!")
         print("Press 'q' to quit, '1-5' to mark attendance for students 1-5")
@@ -73,7 +80,7 @@ class SimpleAttendanceSystem:
             
             # Detect faces
             gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            faces = face_cascade.detectMultiScale(gray, 1.1, 4)
+            faces = motion_gate.detect(gray, lambda region: face_cascade.detectMultiScale(region, 1.1, 4))
             
             # Draw rectangles around faces
             for (x, y, w, h) in faces:
@@ -101,17 +108,25 @@ class SimpleAttendanceSystem:
                 break
             elif key >= ord('1') and key <= ord('5'):
                 student_id = str(key - ord('0'))
-                if self.mark_attendance(student_id):
+                if student_id not in self.attendance_data:
+                    print(f"Student ID {student_id} not found!")
+                elif self.mark_attendance(student_id):
                     student_name = self.attendance_data[student_id]["name"]
                     print(f"Attendance marked for {student_name} (ID: {student_id})")
                     print(f"Total attendance: {self.attendance_data[student_id]['total_attendance']}")
                 else:
-                    print(f"Student ID {student_id} not found!")
+                    print(f"{self.attendance_data[student_id]['name']} already marked, ignored")
         
         cap.release()
         cv2.destroyAllWindows()
+        self.storage.close()
         print("Attendance System Closed!")
 
 if __name__ == "__main__":
-    system = SimpleAttendanceSystem()
+    parser = argparse.ArgumentParser(description="Simple attendance system")
+    parser.add_argument('--storage', choices=['json', 'sqlite'], default='json', help="storage backend")
+    parser.add_argument('--roi', type=parse_roi, action='append', default=None,
+                        help="only watch this part of the frame for faces, as fractions x,y,w,h (repeatable)")
+    args = parser.parse_args()
+    system = SimpleAttendanceSystem(storage_backend=args.storage, motion_rois=args.roi)
     system.run()
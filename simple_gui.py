@@ -1,18 +1,30 @@
 import tkinter as tk
 from tkinter import messagebox, ttk
-import json
+import argparse
 from datetime import datetime
 import cv2
 import threading
-import time
+from frame_grabber import FrameGrabber
+from motion_gate import MotionGate, parse_roi
+from attendance_storage import open_storage
+from attendance_dedup import AttendanceDeduplicator, parse_mark_time
+from table_model import TreeTableModel
+from ui_channel import UIChannel
 
 class SimpleAttendanceGUI:
-    def __init__(self):
+    def __init__(self, storage_backend='json', motion_rois=None):
+        self.storage = open_storage(storage_backend)
+        self.motion_rois = motion_rois
+        # Repeat marks within the dedup window never reach storage
+        self.dedup = AttendanceDeduplicator()
         self.root = tk.Tk()
         self.root.title("Smart Attendance System")
         self.root.geometry("600x500")
         self.root.configure(bg='lightblue')
         
+        # Widget updates from the camera thread go through here
+        self.ui = UIChannel(self.root)
+        
         # Load data
         self.load_data()
         
@@ -20,22 +32,20 @@ class SimpleAttendanceGUI:
         self.create_widgets()
         
     def load_data(self):
-        try:
-            with open('attendance_data.json', 'r') as f:
-                self.data = json.load(f)
-        except:
+        # Same record layout as the other apps sharing attendance_data.json
+        self.data = self.storage.load_tallies()
+        if not self.data:
             self.data = {
-                "1": {"name": "Soumyadeep Mukherjee", "attendance": 0, "last": ""},
-                "2": {"name": "Sundar Pichai", "attendance": 0, "last": ""},
-                "3": {"name": "Elon Musk", "attendance": 0, "last": ""},
-                "4": {"name": "Sparsh Singh", "attendance": 0, "last": ""},
-                "5": {"name": "Tannistha Muhuri", "attendance": 0, "last": ""}
+                "1": {"name": "Soumyadeep Mukherjee", "total_attendance": 0, "last_attendance": ""},
+                "2": {"name": "Sundar Pichai", "total_attendance": 0, "last_attendance": ""},
+                "3": {"name": "Elon Musk", "total_attendance": 0, "last_attendance": ""},
+                "4": {"name": "Sparsh Singh", "total_attendance": 0, "last_attendance": ""},
+                "5": {"name": "Tannistha Muhuri", "total_attendance": 0, "last_attendance": ""}
             }
             self.save_data()
     
     def save_data(self):
-        with open('attendance_data.json', 'w') as f:
-            json.dump(self.data, f, indent=2)
+        self.storage.save_tallies(self.data)
     
     def create_widgets(self):
         # Title
@@ -75,6 +85,7 @@ class SimpleAttendanceGUI:
         for col in columns:
             self.tree.heading(col, text=col)
             self.tree.column(col, width=120)
+        self.table = TreeTableModel(self.tree)
         
         self.tree.pack(fill=tk.BOTH, expand=True)
         
@@ -93,26 +104,29 @@ class SimpleAttendanceGUI:
                                   font=('Arial', 10), bg='lightblue')
         self.face_status.pack()
     
-    def update_display(self):
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        for student_id, info in self.data.items():
-            last = info['last'] if info['last'] else "Never"
-            self.tree.insert('', 'end', values=(
-                student_id, info['name'], info['attendance'], last
+    def update_display(self, student_ids=None):
+        # Rows are keyed by student ID, so a mark only touches that student's row
+        for student_id in (self.data if student_ids is None else student_ids):
+            info = self.data[student_id]
+            last = info['last_attendance'] if info['last_attendance'] else "Never"
+            self.table.update_row(student_id, (
+                student_id, info['name'], info['total_attendance'], last
             ))
     
     def mark_attendance(self, student_id):
+        last_marked = parse_mark_time(self.data[student_id]['last_attendance'])
+        if not self.dedup.admit(student_id, last_marked=last_marked):
+            self.status.config(text=f"{self.data[student_id]['name']} already marked", fg='orange')
+            return
+        
         current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self.data[student_id]["attendance"] += 1
-        self.data[student_id]["last"] = current_time
-        self.save_data()
+        # Only this student's record is written
+        self.data[student_id] = self.storage.record_tally(student_id, current_time)
         
         name = self.data[student_id]["name"]
-        messagebox.showinfo("Success", f"Attendance marked for {name}!\nTotal: {self.data[student_id]['attendance']}")
+        messagebox.showinfo("Success", f"Attendance marked for {name}!\nTotal: {self.data[student_id]['total_attendance']}")
         
-        self.update_display()
+        self.update_display([student_id])
         self.status.config(text=f"Last marked: {name}", fg='blue')
     
     def toggle_camera(self):
@@ -126,7 +140,7 @@ class SimpleAttendanceGUI:
     
     def start_camera(self):
         try:
-            self.cap = cv2.VideoCapture(0)
+            self.cap = FrameGrabber(0)
             if not self.cap.isOpened():
                 messagebox.showerror("Error", "Cannot open camera!")
                 return
@@ -147,10 +161,13 @@ class SimpleAttendanceGUI:
             self.cap.release()
         
         self.camera_btn.config(text="📹 Start Camera", bg='orange')
-        self.face_status.config(text="Camera: Off", fg='black')
+        # Queued behind any status the camera thread posted before it stopped
+        self.ui.post(self.face_status.config, key='face_status', text="Camera: Off", fg='black')
     
     def detect_faces(self):
         face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        # The cascade only runs on parts of the frame that changed
+        motion_gate = MotionGate(self.motion_rois)
         
         while self.camera_running:
             try:
@@ -159,21 +176,27 @@ class SimpleAttendanceGUI:
                     break
                 
                 gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                faces = face_cascade.detectMultiScale(gray, 1.1, 4)
+                faces = motion_gate.detect(gray, lambda region: face_cascade.detectMultiScale(region, 1.1, 4))
                 
                 if len(faces) > 0:
-                    self.face_status.config(text=f"Camera: On - {len(faces)} face(s) detected!", fg='green')
+                    self.ui.post(self.face_status.config, key='face_status',
+                                 text=f"Camera: On - {len(faces)} face(s) detected!", fg='green')
                 else:
-                    self.face_status.config(text="Camera: On - No faces detected", fg='orange')
-                
-                time.sleep(0.5)
+                    self.ui.post(self.face_status.config, key='face_status',
+                                 text="Camera: On - No faces detected", fg='orange')
                 
             except:
                 break
     
     def run(self):
         self.root.mainloop()
+        self.storage.close()
 
 if __name__ == "__main__":
-    app = SimpleAttendanceGUI()
+    parser = argparse.ArgumentParser(description="Simple attendance GUI")
+    parser.add_argument('--storage', choices=['json', 'sqlite'], default='json', help="storage backend")
+    parser.add_argument('--roi', type=parse_roi, action='append', default=None,
+                        help="only watch this part of the frame for faces, as fractions x,y,w,h (repeatable)")
+    args = parser.parse_args()
+    app = SimpleAttendanceGUI(storage_backend=args.storage, motion_rois=args.roi)
     app.run()
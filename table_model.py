@@ -0,0 +1,97 @@
+class TreeTableModel:
+    """Keeps a ttk.Treeview in step with a keyed set of rows
+
+    Rows are inserted with iid=key, so a change to one student touches only
+    that student's row; set_rows() diffs a full refresh against what is
+    already shown. With page_size set, only the current page of rows is
+    ever materialized in the Treeview.
+    """
+
+    def __init__(self, tree, page_size=None, on_page_change=None):
+        self.tree = tree
+        self.page_size = page_size
+        self.on_page_change = on_page_change
+        self.rows = {}          # key -> values, in display order
+        self.shown = []         # keys currently in the tree, in tree order
+        self.shown_values = {}  # key -> values currently in the tree
+        self.page = 0
+
+    def __len__(self):
+        return len(self.rows)
+
+    def set_rows(self, rows):
+        """Replace the model with (key, values) pairs and apply only the differences"""
+        self.rows = {str(key): tuple(values) for key, values in rows}
+        self._sync()
+
+    def update_row(self, key, values):
+        """Change or add one row"""
+        key = str(key)
+        values = tuple(values)
+        is_new = key not in self.rows
+        self.rows[key] = values
+        if key in self.shown_values:
+            if self.shown_values[key] != values:
+                self.tree.item(key, values=values)
+                self.shown_values[key] = values
+        elif is_new:
+            self._sync()    # May land on the current page or change the page count
+
+    def remove_row(self, key):
+        key = str(key)
+        if self.rows.pop(key, None) is not None:
+            self._sync()
+
+    def values(self, key):
+        return self.rows.get(str(key))
+
+    def page_count(self):
+        if not self.page_size:
+            return 1
+        return max(1, -(-len(self.rows) // self.page_size))
+
+    def set_page(self, page):
+        self.page = min(max(page, 0), self.page_count() - 1)
+        self._sync()
+
+    def next_page(self):
+        self.set_page(self.page + 1)
+
+    def previous_page(self):
+        self.set_page(self.page - 1)
+
+    def visible_keys(self):
+        keys = list(self.rows)
+        if not self.page_size:
+            return keys
+        self.page = min(self.page, self.page_count() - 1)
+        start = self.page * self.page_size
+        return keys[start:start + self.page_size]
+
+    def _sync(self):
+        visible = self.visible_keys()
+        visible_set = set(visible)
+
+        stale = [key for key in self.shown if key not in visible_set]
+        if stale:
+            self.tree.delete(*stale)
+            for key in stale:
+                del self.shown_values[key]
+
+        kept = [key for key in self.shown if key in visible_set]
+        # Rows only need moving when new rows slot in between or the order changed
+        in_order = kept == visible[:len(kept)]
+        for index, key in enumerate(visible):
+            values = self.rows[key]
+            if key not in self.shown_values:
+                self.tree.insert('', index if not in_order else 'end', iid=key, values=values)
+            else:
+                if self.shown_values[key] != values:
+                    self.tree.item(key, values=values)
+                if not in_order:
+                    self.tree.move(key, '', index)
+            self.shown_values[key] = values
+        self.shown = visible
+
+        if self.on_page_change is not None:
+            self.on_page_change(self.page, self.page_count())
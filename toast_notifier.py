@@ -0,0 +1,113 @@
+import tkinter as tk
+from collections import deque, Counter
+from datetime import datetime
+
+STATUS_STYLES = {
+    "Present": ("✅", "#27ae60", "PRESENT"),
+    "Identified": ("👤", "#3498db", "IDENTIFIED"),
+    "Absent": ("❌", "#e74c3c", "ABSENT"),
+}
+
+
+class ToastNotifier:
+    """Non-modal attendance toasts shown one at a time in a single reused window
+
+    notify() only queues a message. Messages are shown at most one per
+    min_interval_ms, and when burst_threshold or more are waiting they are
+    collapsed into one "N students marked" summary. The window is
+    withdrawn display_ms after the last message instead of being destroyed.
+    Must be called on the Tk thread.
+    """
+
+    def __init__(self, root, display_ms=3000, min_interval_ms=800, burst_threshold=3):
+        self.root = root
+        self.display_ms = display_ms
+        self.min_interval_ms = min_interval_ms
+        self.burst_threshold = burst_threshold
+        self.pending = deque()      # (student_name, student_id, status, time_str)
+        self.window = None
+        self.pump_job = None
+        self.hide_job = None
+        self.shown = 0
+        self.collapsed = 0
+
+    def notify(self, student_name, student_id, status):
+        self.pending.append((student_name, student_id, status, datetime.now().strftime('%H:%M:%S')))
+        if self.pump_job is None:
+            self._pump()
+
+    def _build(self):
+        # Created once and reused; withdrawn rather than destroyed between messages
+        self.window = tk.Toplevel(self.root)
+        self.window.overrideredirect(True)
+        self.window.attributes('-topmost', True)
+        self.window.configure(bg='#2c3e50')
+
+        main_frame = tk.Frame(self.window, bg='#2c3e50')
+        main_frame.pack(expand=True, fill=tk.BOTH, padx=20, pady=15)
+
+        self.icon_label = tk.Label(main_frame, font=('Arial', 32), bg='#2c3e50')
+        self.icon_label.pack()
+        self.name_label = tk.Label(main_frame, font=('Arial', 16, 'bold'), bg='#2c3e50', fg='white',
+                                   wraplength=320)
+        self.name_label.pack(pady=2)
+        self.status_label = tk.Label(main_frame, font=('Arial', 13), bg='#2c3e50')
+        self.status_label.pack(pady=2)
+        self.time_label = tk.Label(main_frame, font=('Arial', 10), bg='#2c3e50', fg='#bdc3c7')
+        self.time_label.pack(pady=2)
+
+    def _pump(self):
+        self.pump_job = None
+        if not self.pending:
+            return
+
+        if len(self.pending) >= self.burst_threshold:
+            batch = list(self.pending)
+            self.pending.clear()
+            self.collapsed += len(batch)
+            self._show_summary(batch)
+        else:
+            self._show(*self.pending.popleft())
+        self.shown += 1
+
+        if self.hide_job is not None:
+            self.root.after_cancel(self.hide_job)
+        self.hide_job = self.root.after(self.display_ms, self._hide)
+        # Rate limit: the next message waits until this one has been up for min_interval_ms
+        self.pump_job = self.root.after(self.min_interval_ms, self._pump)
+
+    def _present(self, icon_text, color, name_text, status_text, time_str):
+        if self.window is None or not self.window.winfo_exists():
+            self._build()
+        self.icon_label.config(text=icon_text, fg=color)
+        self.name_label.config(text=name_text)
+        self.status_label.config(text=status_text, fg=color)
+        self.time_label.config(text=f"Time: {time_str}")
+
+        # Bottom-right corner of the main window, without taking focus or grabbing input
+        self.window.update_idletasks()
+        x = self.root.winfo_rootx() + self.root.winfo_width() - self.window.winfo_reqwidth() - 20
+        y = self.root.winfo_rooty() + self.root.winfo_height() - self.window.winfo_reqheight() - 20
+        self.window.geometry(f"+{max(x, 0)}+{max(y, 0)}")
+        self.window.deiconify()
+        self.window.lift()
+
+    def _show(self, student_name, student_id, status, time_str):
+        icon_text, color, status_text = STATUS_STYLES.get(status, STATUS_STYLES["Absent"])
+        self._present(icon_text, color, student_name, f"Marked as {status_text}", time_str)
+
+    def _show_summary(self, batch):
+        counts = Counter(status for _, _, status, _ in batch)
+        status, _ = counts.most_common(1)[0]
+        icon_text, color, _ = STATUS_STYLES.get(status, STATUS_STYLES["Absent"])
+
+        names = [name for name, _, _, _ in batch]
+        preview = ", ".join(names[:3]) + (f" +{len(names) - 3} more" if len(names) > 3 else "")
+        breakdown = ", ".join(f"{count} {s.lower()}" for s, count in counts.items())
+        self._present(icon_text, color, f"{len(batch)} students marked", f"{breakdown}\n{preview}",
+                      batch[-1][3])
+
+    def _hide(self):
+        self.hide_job = None
+        if self.window is not None and self.window.winfo_exists():
+            self.window.withdraw()
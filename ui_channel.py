@@ -0,0 +1,64 @@
+import queue
+import threading
+import tkinter as tk
+
+
+class UIChannel:
+    """Hands UI updates from worker threads to the Tk main loop
+
+    Worker threads post() callables instead of touching widgets; the queue
+    is drained every `interval` ms by root.after on the Tk thread. Posts
+    that share a key are coalesced, so a camera thread reporting its status
+    every frame only costs one widget update per drain.
+    """
+
+    def __init__(self, root, interval=50, max_per_drain=200):
+        self.root = root
+        self.interval = interval
+        self.max_per_drain = max_per_drain
+        self.queue = queue.SimpleQueue()
+        self.lock = threading.Lock()
+        self.latest = {}    # key -> newest (fn, args, kwargs) not yet applied
+        self.coalesced = 0
+        self.root.after(self.interval, self._drain)
+
+    def post(self, fn, *args, key=None, **kwargs):
+        """Run fn(*args, **kwargs) on the Tk thread; with a key, only the newest post per key runs"""
+        if key is None:
+            self.queue.put((fn, args, kwargs))
+            return
+        with self.lock:
+            pending = key in self.latest
+            self.latest[key] = (fn, args, kwargs)
+            if pending:
+                self.coalesced += 1
+        if not pending:
+            self.queue.put((None, key, None))   # Holds the key's place in the queue
+
+    def post_later(self, delay_ms, fn, *args, **kwargs):
+        """Like post(), but runs delay_ms after reaching the Tk thread"""
+        self.post(self.root.after, delay_ms, lambda: self._run(fn, args, kwargs))
+
+    def _run(self, fn, args, kwargs):
+        try:
+            fn(*args, **kwargs)
+        except tk.TclError:
+            pass    # The widget was destroyed (screen changed) before the update arrived
+
+    def _drain(self):
+        try:
+            for _ in range(self.max_per_drain):
+                try:
+                    fn, args, kwargs = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if fn is None:
+                    with self.lock:
+                        fn, args, kwargs = self.latest.pop(args)
+                self._run(fn, args, kwargs)
+        finally:
+            # Rescheduled even if an update raised, so one bad post can't stop the channel
+            try:
+                self.root.after(self.interval, self._drain)
+            except tk.TclError:
+                pass    # Root window destroyed